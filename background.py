@@ -0,0 +1,36 @@
+import asyncio
+import logging
+from typing import Any, Coroutine, Set
+
+from metrics import BACKGROUND_ERRORS
+
+# Сильные ссылки на задачи: иначе сборщик мусора может удалить незавершённую задачу
+_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(coro: Coroutine[Any, Any, Any], name: str) -> asyncio.Task:
+    """Запустить фоновую задачу; исключение попадёт в лог и метрику, а не потеряется"""
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_done)
+    return task
+
+
+def _done(task: asyncio.Task):
+    _tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        BACKGROUND_ERRORS.inc(task.get_name())
+        logging.error(f"❌ Ошибка фоновой задачи {task.get_name()}: {error!r}")
+
+
+def pending() -> int:
+    return len(_tasks)
+
+
+async def drain(timeout: float = 10):
+    """Дождаться фоновых задач при остановке"""
+    if _tasks:
+        await asyncio.wait(list(_tasks), timeout=timeout)
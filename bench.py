@@ -0,0 +1,259 @@
+"""Микробенчмарки генератора паролей и клавиатур.
+
+    python bench.py                          # прогон, таблица результатов
+    python bench.py --save bench.json        # сохранить базовую линию
+    python bench.py --compare bench.json     # сравнить с базовой линией (код 1 при регрессии)
+    python bench.py -k generate --quick      # только подходящие по имени, короткий прогон
+
+Скорость — лучшая из нескольких серий (ops/sec). Память — пиковый объём,
+выделяемый за одну операцию (tracemalloc), и прирост числа живых блоков
+на операцию (утечки и растущие кэши).
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, NamedTuple
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("FSM_STORAGE", "memory")
+
+import keyboards  # noqa: E402
+from bot import get_preview_text  # noqa: E402
+from config import config  # noqa: E402
+from generator import CHAR_MASK, CHAR_TABLES, MASK_FLAGS, PasswordGenerator, np  # noqa: E402
+from inline import build_results, get_spec, parse_query  # noqa: E402
+from wordlist import Wordlist, build as build_wordlist  # noqa: E402
+
+LENGTHS = range(config.MIN_LENGTH, config.MAX_LENGTH + 1)
+ALLOC_NOISE_BYTES = 64
+
+
+class Benchmark(NamedTuple):
+    name: str
+    func: Callable[[], object]
+
+
+def mask_params(mask: int, length: int) -> Dict[str, object]:
+    params = {key: bool(mask & bit) for key, bit in MASK_FLAGS}
+    params['length'] = length
+    return params
+
+
+def flags_name(mask: int) -> str:
+    short = {'include_digits': 'd', 'include_lowercase': 'l', 'include_uppercase': 'u',
+             'include_special': 's', 'exclude_similar': 'x', 'require_all_types': 'r', 'no_repeats': 'n'}
+    return ''.join(short[key] for key, bit in MASK_FLAGS if mask & bit)
+
+
+def valid_params() -> List[Dict[str, object]]:
+    """Вся матрица флагов × длины 4–50, кроме недопустимых комбинаций"""
+    result = []
+    for mask in range(1 << len(MASK_FLAGS)):
+        alphabet = CHAR_TABLES[mask & CHAR_MASK].alphabet
+        if not alphabet:
+            continue
+        for length in LENGTHS:
+            if mask & 64 and length > len(alphabet):
+                continue
+            result.append(mask_params(mask, length))
+    return result
+
+
+def synthetic_wordlist(size: int = 7776) -> Wordlist:
+    """Словарь из size слов во временном файле: результат не зависит от установленного словаря"""
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "wordlist.bin")
+    build_wordlist([f"word{i}" for i in range(size)], path)
+    return Wordlist(path)
+
+
+def cycling(func: Callable, args: List) -> Callable[[], object]:
+    """Операция, которая на каждом вызове берёт следующий аргумент по кругу"""
+    it: Iterator = itertools.cycle(args)
+    return lambda: func(next(it))
+
+
+def collect() -> List[Benchmark]:
+    all_params = valid_params()
+    benches = [
+        Benchmark("get_alphabet", cycling(PasswordGenerator.get_alphabet, all_params)),
+        Benchmark("calculate_security", cycling(PasswordGenerator.calculate_security, all_params)),
+        Benchmark("get_preview_text", cycling(get_preview_text, all_params)),
+    ]
+
+    # generate_password: по бенчмарку на комбинацию флагов, длины 4–50 по кругу
+    by_mask: Dict[int, List] = {}
+    for params in all_params:
+        by_mask.setdefault(sum(bit for key, bit in MASK_FLAGS if params[key]), []).append(params)
+    for mask, params_list in sorted(by_mask.items()):
+        benches.append(Benchmark(f"generate_password[{flags_name(mask)}]",
+                                 cycling(PasswordGenerator.generate_password, params_list)))
+    benches.append(Benchmark("generate_batch[dlus,len16]x1000",
+                             lambda: PasswordGenerator.generate_batch(mask_params(15, 16), 1000)))
+
+    # Парольные фразы: выборка слов из mmap-словаря
+    words = synthetic_wordlist()
+    for name, extra in (("", {}), (",cap,digit", {'capitalize': True, 'add_digit': True})):
+        params = {'mode': 'passphrase', 'word_count': 6, 'separator': '-', **extra}
+        benches.append(Benchmark(f"generate_passphrase[6 words{name}]",
+                                 lambda params=params: PasswordGenerator.generate_passphrase(params, words)))
+
+    # Inline-ответ: разбор запроса, заготовка из кэша и статьи с паролями
+    benches.append(Benchmark("inline_results[16 dlus]x5",
+                             lambda: build_results(get_spec(*parse_query("16 dlus")), config.INLINE_RESULTS)))
+
+    # Клавиатуры: как их вызывают обработчики (из кэша) и построение с нуля
+    char_flags = [{key: bool(m & (1 << i)) for i, (key, _) in enumerate(keyboards.CHAR_TYPES)} for m in range(16)]
+    option_flags = [{key: bool(m & (1 << i)) for i, (key, _) in enumerate(keyboards.OPTIONS)} for m in range(8)]
+    phrase_masks = [(separator, m) for separator in config.SEPARATORS for m in range(1 << len(keyboards.PHRASE_OPTIONS))]
+    phrase_flags = [
+        (separator, {key: bool(m & (1 << i)) for i, (key, _) in enumerate(keyboards.PHRASE_OPTIONS)})
+        for separator, m in phrase_masks
+    ]
+    now = datetime(2024, 1, 1)
+    templates = [
+        {'id': i, 'name': f"Шаблон {i}", 'length': 16, 'created_at': now - timedelta(minutes=i)}
+        for i in range(1, config.TEMPLATES_PAGE_SIZE + 1)
+    ]
+    static = ['main_menu_kb', 'length_kb', 'preview_kb', 'generated_kb', 'back_to_main_kb', 'help_kb',
+              'word_count_kb', 'phrase_preview_kb']
+    for name in static:
+        factory = getattr(keyboards, name)
+        benches.append(Benchmark(f"kb.{name}", factory))
+        benches.append(Benchmark(f"kb.{name}[cold]", factory.__wrapped__))
+    benches += [
+        Benchmark("kb.char_types_kb", cycling(keyboards.char_types_kb, char_flags)),
+        Benchmark("kb.char_types_kb[cold]", cycling(keyboards._char_types_kb.__wrapped__, range(16))),
+        Benchmark("kb.options_kb", cycling(keyboards.options_kb, option_flags)),
+        Benchmark("kb.options_kb[cold]", cycling(keyboards._options_kb.__wrapped__, range(8))),
+        Benchmark("kb.phrase_options_kb", cycling(lambda args: keyboards.phrase_options_kb(*args), phrase_flags)),
+        Benchmark("kb.phrase_options_kb[cold]",
+                  cycling(lambda args: keyboards._phrase_options_kb.__wrapped__(*args), phrase_masks)),
+        Benchmark("kb.templates_kb", lambda: keyboards.templates_kb(templates, True, True)),
+        Benchmark("kb.templates_kb[cold]", lambda: keyboards._templates_kb.__wrapped__(
+            tuple((t['id'], t['name'], keyboards.template_size(t)) for t in templates), "p1.1", "n1.8")),
+        Benchmark("kb.template_actions_kb", cycling(keyboards.template_actions_kb, range(1, 101))),
+        Benchmark("kb.template_actions_kb[cold]", cycling(keyboards.template_actions_kb.__wrapped__, range(1, 101))),
+    ]
+    return benches
+
+
+def measure_speed(func: Callable, min_time: float, repeats: int) -> Dict[str, float]:
+    # Подбор числа итераций, чтобы одна серия длилась не меньше min_time
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.2))
+
+    rates = [loops / elapsed]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        rates.append(loops / (time.perf_counter() - started))
+    return {'ops_per_sec': max(rates), 'median_ops_per_sec': statistics.median(rates)}
+
+
+def measure_memory(func: Callable, ops: int) -> Dict[str, float]:
+    func()  # прогрев кэшей
+    tracemalloc.start()
+    try:
+        peak_total = 0
+        blocks_before = sys.getallocatedblocks()
+        for _ in range(ops):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            peak_total += tracemalloc.get_traced_memory()[1] - current
+        blocks = sys.getallocatedblocks() - blocks_before
+    finally:
+        tracemalloc.stop()
+    return {'alloc_bytes': peak_total / ops, 'retained_blocks': blocks / ops}
+
+
+def run(benches: List[Benchmark], min_time: float, repeats: int, memory_ops: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for bench in benches:
+        result = measure_speed(bench.func, min_time, repeats)
+        result.update(measure_memory(bench.func, memory_ops))
+        results[bench.name] = result
+        print(f"{bench.name:<45} {result['ops_per_sec']:>14,.0f} ops/s "
+              f"{result['alloc_bytes']:>10,.0f} B/op {result['retained_blocks']:>8.2f} blk/op", flush=True)
+    return results
+
+
+def meta() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'numpy': np.__version__ if np is not None else None,
+        'date': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> bool:
+    """Сравнить с базовой линией; True — регрессий нет"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    base_meta = baseline.get('meta', {})
+    if base_meta.get('python') != platform.python_version() or base_meta.get('numpy') != meta()['numpy']:
+        print(f"⚠️ Базовая линия снята на другом окружении: {base_meta}")
+
+    ok = True
+    print(f"\n{'benchmark':<45} {'ops/s':>10} {'alloc':>10}")
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<45} {'new':>10}")
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        alloc_delta = result['alloc_bytes'] - base['alloc_bytes']
+        alloc = alloc_delta / max(base['alloc_bytes'], 1)
+        # Разница в пару объектов — шум tracemalloc, а не регрессия
+        regressed = speed < -threshold or (alloc > threshold and alloc_delta > ALLOC_NOISE_BYTES)
+        ok = ok and not regressed
+        print(f"{name:<45} {speed:>+10.1%} {alloc:>+10.1%}{'  ❌ регрессия' if regressed else ''}")
+    return ok
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки генератора и клавиатур")
+    parser.add_argument('-k', dest='pattern', help="только бенчмарки, в имени которых есть подстрока")
+    parser.add_argument('--save', metavar='FILE', help="сохранить результаты в JSON")
+    parser.add_argument('--compare', metavar='FILE', help="сравнить с базовой линией из JSON")
+    parser.add_argument('--threshold', type=float, default=0.10, help="допустимое ухудшение (доля), по умолчанию 0.10")
+    parser.add_argument('--min-time', type=float, default=0.2, help="минимальная длительность серии, с")
+    parser.add_argument('--repeats', type=int, default=5, help="число серий")
+    parser.add_argument('--quick', action='store_true', help="короткий прогон (0.05 с × 3 серии)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.min_time, args.repeats = 0.05, 3
+
+    benches = [b for b in collect() if not args.pattern or args.pattern in b.name]
+    results = run(benches, args.min_time, args.repeats, memory_ops=200)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta(), 'results': results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"💾 Сохранено: {args.save}")
+    if args.compare:
+        return 0 if compare(results, args.compare, args.threshold) else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
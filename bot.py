@@ -1,27 +1,44 @@
 import asyncio
-import random
-import math
 import logging
 import os
+import signal
 from aiohttp import web
-from typing import Dict, Any, Tuple
+from typing import Dict, Any
 from datetime import datetime
 
-from aiogram import Bot, Dispatcher, Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import CommandStart, Command
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, CallbackQuery, FSInputFile, InlineQuery, InlineQueryResultsButton
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.exceptions import TelegramUnauthorizedError
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 
 from config import config
 from states import PasswordStates
+from callbacks import Action, CallbackDispatcher, PageCursor
 from keyboards import (
     main_menu_kb, length_kb, char_types_kb, options_kb,
     preview_kb, templates_kb, template_actions_kb,
-    generated_kb, back_to_main_kb, help_kb
+    generated_kb, back_to_main_kb, help_kb,
+    word_count_kb, phrase_options_kb, phrase_preview_kb
 )
-from database import db
+from database import db, params_from_row
+from generator import PasswordGenerator
+from wordlist import wordlist
+from inline import SPEC_HELP, build_results, get_spec, parse_query
+from storage import PostgresStorage
+from middlewares import (
+    ApiMetricsMiddleware, HandlerMetricsMiddleware, PendingEditsMiddleware, ProfilingMiddleware,
+    ThrottlingMiddleware, UpdateMetricsMiddleware
+)
+from profiling import profiler
+from edits import edit_coalescer
+from background import spawn
+import background
+from scheduler import ScheduledDispatcher, UpdateScheduler
+from throttling import throttler
+import metrics
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -30,106 +47,43 @@ logger = logging.getLogger(__name__)
 # Инициализация
 router = Router()
 # Инициализацию бота перенесли внутрь main, чтобы проверить токен перед стартом
-dp = Dispatcher(storage=MemoryStorage())
+storage = PostgresStorage(db) if config.FSM_STORAGE == "postgres" else MemoryStorage()
+# Апдейты одного пользователя обрабатываются по порядку, всех вместе — не больше SCHEDULER_WORKERS
+scheduler = UpdateScheduler(config.SCHEDULER_WORKERS)
+dp = ScheduledDispatcher(scheduler, storage=storage) if config.SCHEDULER_ENABLED else Dispatcher(storage=storage)
 dp.include_router(router)
-
-# === ЛОГИКА ГЕНЕРАТОРА ===
-class PasswordGenerator:
-    """Генератор паролей"""
-    
-    @staticmethod
-    def get_alphabet(params: Dict[str, Any]) -> str:
-        """Получить алфавит на основе параметров"""
-        alphabet = ""
-        
-        if params.get('include_digits'):
-            alphabet += config.DIGITS
-        if params.get('include_lowercase'):
-            alphabet += config.LOWERCASE
-        if params.get('include_uppercase'):
-            alphabet += config.UPPERCASE
-        if params.get('include_special'):
-            alphabet += config.SPECIAL
-        
-        if params.get('exclude_similar'):
-            for char, replace in config.SIMILAR_CHARS.items():
-                alphabet = alphabet.replace(char, '')
-        
-        return alphabet
-    
-    @staticmethod
-    def generate_password(params: Dict[str, Any]) -> str:
-        """Оптимизированная генерация пароля"""
-        length = params['length']
-        alphabet = PasswordGenerator.get_alphabet(params)
-        
-        if not alphabet:
-            raise ValueError("Алфавит пустой. Выберите хотя бы один тип символов.")
-        
-        if params.get('no_repeats') and len(alphabet) < length:
-            raise ValueError(f"Невозможно сгенерировать пароль без повторов: "
-                           f"алфавит ({len(alphabet)}) меньше длины ({length})")
-        
-        password_chars = []
-        
-        # Если обязательно нужны все типы
-        if params.get('require_all_types'):
-            required_groups = []
-            if params.get('include_digits'): required_groups.append(config.DIGITS)
-            if params.get('include_lowercase'): required_groups.append(config.LOWERCASE)
-            if params.get('include_uppercase'): required_groups.append(config.UPPERCASE)
-            if params.get('include_special'): required_groups.append(config.SPECIAL)
-            
-            for group in required_groups:
-                if params.get('exclude_similar'):
-                    group = ''.join([c for c in group if c not in config.SIMILAR_CHARS])
-                
-                if group:
-                    char = random.choice(group)
-                    password_chars.append(char)
-                    if params.get('no_repeats'):
-                        alphabet = alphabet.replace(char, '', 1)
-
-        # Дозаполняем остаток
-        remaining_length = length - len(password_chars)
-        
-        if remaining_length > 0:
-            if params.get('no_repeats'):
-                password_chars.extend(random.sample(alphabet, remaining_length))
-            else:
-                password_chars.extend(random.choices(alphabet, k=remaining_length))
-        
-        random.shuffle(password_chars)
-        return ''.join(password_chars)
-    
-    @staticmethod
-    def calculate_security(params: Dict[str, Any]) -> Tuple[str, str, float]:
-        """Рассчитать безопасность пароля"""
-        alphabet = PasswordGenerator.get_alphabet(params)
-        alphabet_size = len(alphabet)
-        length = params['length']
-        
-        if params.get('no_repeats'):
-            if alphabet_size < length:
-                combinations = 0
-            else:
-                combinations = math.prod(range(alphabet_size - length + 1, alphabet_size + 1))
-        else:
-            combinations = alphabet_size ** length
-        
-        if combinations < 10**6:
-            level = "very_low"
-        elif combinations < 10**12:
-            level = "low"
-        elif combinations < 10**18:
-            level = "medium"
-        elif combinations < 10**24:
-            level = "high"
-        else:
-            level = "very_high"
-        
-        security_name, time_estimate = config.SECURITY_LEVELS[level]
-        return security_name, time_estimate, combinations
+# Все callback-кнопки идут через одну таблицу обработчиков (см. callbacks.py)
+callbacks = CallbackDispatcher()
+router.callback_query.register(callbacks.dispatch)
+
+# Профилирование медленных апдейтов по фазам (см. /slow)
+dp.update.outer_middleware(ProfilingMiddleware(profiler))
+# Метрики: апдейты целиком, обработчики и (в main) исходящие вызовы Bot API
+dp.update.outer_middleware(UpdateMetricsMiddleware())
+router.message.middleware(HandlerMetricsMiddleware())
+router.callback_query.middleware(HandlerMetricsMiddleware())
+router.inline_query.middleware(HandlerMetricsMiddleware())
+# Переключатели обновляют клавиатуру отложенно (см. edits.py); остальные кнопки
+# сначала отправляют отложенную клавиатуру, чтобы она не перезаписала новый экран
+router.callback_query.middleware(
+    PendingEditsMiddleware(edit_coalescer, (
+        Action.TOGGLE_CHAR_TYPE, Action.TOGGLE_OPTION, Action.SEPARATOR, Action.TOGGLE_PHRASE_OPTION
+    ))
+)
+# Ограничение частоты: лишние нажатия отклоняются до обработчиков и запросов к БД
+if config.THROTTLE_ENABLED:
+    dp.message.outer_middleware(ThrottlingMiddleware(throttler))
+    dp.callback_query.outer_middleware(ThrottlingMiddleware(throttler))
+    dp.inline_query.outer_middleware(ThrottlingMiddleware(throttler))
+metrics.GaugeFunc("bot_scheduler_pending", "Updates waiting in per-user queues", lambda: scheduler.pending)
+metrics.GaugeFunc("bot_scheduler_users", "Users with queued or running updates", lambda: scheduler.users)
+metrics.GaugeFunc("bot_scheduler_busy_workers", "Scheduler workers processing an update", lambda: scheduler.busy)
+metrics.GaugeFunc("bot_background_tasks", "Background tasks in flight", background.pending)
+if isinstance(dp.storage, PostgresStorage):
+    metrics.GaugeFunc("bot_fsm_cache_hits_total", "FSM storage cache hits", lambda: dp.storage.cache.hits, "counter")
+    metrics.GaugeFunc("bot_fsm_cache_misses_total", "FSM storage cache misses", lambda: dp.storage.cache.misses, "counter")
+    metrics.GaugeFunc("bot_fsm_db_reads_total", "FSM storage reads from Postgres", lambda: dp.storage.db_reads, "counter")
+    metrics.GaugeFunc("bot_fsm_db_writes_total", "FSM storage rows written to Postgres", lambda: dp.storage.db_writes, "counter")
 
 # ========== HANDLERS ==========
 
@@ -154,7 +108,7 @@ async def cmd_start(message: Message, state: FSMContext):
 async def cmd_help(message: Message, state: FSMContext):
     await show_help(message)
 
-@router.callback_query(F.data == "help")
+@callbacks.handler(Action.HELP)
 async def callback_help(callback: CallbackQuery, state: FSMContext):
     await show_help(callback.message)
     await callback.answer()
@@ -167,6 +121,8 @@ async def show_help(message: Message):
         "2. Выберите типы символов\n"
         "3. Настройте дополнительные опции\n"
         "4. Просмотрите параметры и сгенерируйте\n\n"
+        "🔤 *Парольная фраза* — несколько случайных слов из словаря, "
+        "её легче запомнить и набрать\n\n"
         "💡 *Совет:*\n"
         "Используйте менеджер паролей и включайте двухфакторную аутентификацию."
     )
@@ -174,7 +130,7 @@ async def show_help(message: Message):
 
 # ========== MAIN MENU ==========
 
-@router.callback_query(F.data == "back_to_main")
+@callbacks.handler(Action.BACK_TO_MAIN)
 async def back_to_main(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await state.set_state(PasswordStates.MAIN_MENU)
@@ -185,7 +141,7 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "new_password")
+@callbacks.handler(Action.NEW_PASSWORD)
 async def new_password(callback: CallbackQuery, state: FSMContext):
     await state.set_state(PasswordStates.SET_LENGTH)
     await callback.message.edit_text(
@@ -196,36 +152,29 @@ async def new_password(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "last_params")
+@callbacks.handler(Action.LAST_PARAMS)
 async def last_params(callback: CallbackQuery, state: FSMContext):
-    user_id = (await db.get_or_create_user(callback.from_user.id))['id']
-    last_params_data = await db.get_last_params(user_id)
+    last_params_data = await db.get_last_params_for_telegram_user(callback.from_user.id)
     
     if not last_params_data:
         await callback.answer("❌ У вас нет сохраненных параметров", show_alert=True)
         return
     
-    params = {
-        'length': last_params_data['length'],
-        'include_digits': last_params_data['include_digits'],
-        'include_lowercase': last_params_data['include_lowercase'],
-        'include_uppercase': last_params_data['include_uppercase'],
-        'include_special': last_params_data['include_special'],
-        'exclude_similar': last_params_data['exclude_similar'],
-        'require_all_types': last_params_data['require_all_types'],
-        'no_repeats': last_params_data['no_repeats']
-    }
-    
+    params = params_from_row(last_params_data)
     await state.update_data(params=params)
-    await generate_and_send_password(callback.message, params, state)
+    try:
+        await generate_and_send_password(callback.message, params, state)
+    except ValueError as e:
+        await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
+        return
     await callback.answer()
 
-@router.callback_query(F.data == "my_templates")
+@callbacks.handler(Action.MY_TEMPLATES)
 async def my_templates(callback: CallbackQuery, state: FSMContext):
     user_id = (await db.get_or_create_user(callback.from_user.id))['id']
-    templates = await db.get_user_templates(user_id)
+    page = await db.get_templates_page(user_id)
     
-    if not templates:
+    if not page.items:
         await callback.message.edit_text(
             "📁 *Мои шаблоны*\n\n"
             "У вас пока нет сохраненных шаблонов.",
@@ -237,16 +186,30 @@ async def my_templates(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text(
             "📁 *Мои шаблоны*\n\n"
             "Выберите шаблон для использования:",
-            reply_markup=templates_kb(templates),
+            reply_markup=templates_kb(page.items, page.has_prev, page.has_next),
             parse_mode="Markdown"
         )
     await callback.answer()
 
+@callbacks.handler(Action.TEMPLATES_PAGE)
+async def templates_page(callback: CallbackQuery, state: FSMContext, cursor: PageCursor):
+    user_id = (await db.get_or_create_user(callback.from_user.id))['id']
+    page = await db.get_templates_page(user_id, (cursor.created_at, cursor.id), backward=cursor.backward)
+    
+    if not page.items:
+        # Соседняя страница опустела (шаблоны удалены) — возвращаемся к началу
+        await my_templates(callback, state)
+        return
+    
+    await callback.message.edit_reply_markup(
+        reply_markup=templates_kb(page.items, page.has_prev, page.has_next)
+    )
+    await callback.answer()
+
 # ========== LENGTH SELECTION ==========
 
-@router.callback_query(F.data.startswith("length_"))
-async def set_length(callback: CallbackQuery, state: FSMContext):
-    length = int(callback.data.split("_")[1])
+@callbacks.handler(Action.LENGTH)
+async def set_length(callback: CallbackQuery, state: FSMContext, length: int):
     await state.update_data(length=length)
     await state.set_state(PasswordStates.SET_CHAR_TYPES)
     
@@ -258,7 +221,7 @@ async def set_length(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "custom_length")
+@callbacks.handler(Action.CUSTOM_LENGTH)
 async def custom_length(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
         "✏️ *Введите длину пароля*\n\n"
@@ -290,17 +253,16 @@ async def process_custom_length(message: Message, state: FSMContext):
 
 # ========== CHAR TYPES ==========
 
-@router.callback_query(F.data.startswith("toggle_"))
-async def toggle_char_type(callback: CallbackQuery, state: FSMContext):
-    char_type = callback.data.split("_")[1]
+@callbacks.handler(Action.TOGGLE_CHAR_TYPE)
+async def toggle_char_type(callback: CallbackQuery, state: FSMContext, char_type: str):
     data = await state.get_data()
     char_types = data.get('char_types', {'digits': False, 'lowercase': False, 'uppercase': False, 'special': False})
     char_types[char_type] = not char_types.get(char_type, False)
     await state.update_data(char_types=char_types)
-    await callback.message.edit_reply_markup(reply_markup=char_types_kb(char_types))
     await callback.answer()
+    await edit_coalescer.edit_markup(callback.message, char_types_kb(char_types))
 
-@router.callback_query(F.data == "to_options")
+@callbacks.handler(Action.TO_OPTIONS)
 async def to_options(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     char_types = data.get('char_types', {})
@@ -324,11 +286,8 @@ async def to_options(callback: CallbackQuery, state: FSMContext):
 
 # ========== OPTIONS (ИСПРАВЛЕНО) ==========
 
-@router.callback_query(F.data.startswith("option_"))
-async def toggle_option(callback: CallbackQuery, state: FSMContext):
-    # ИСПРАВЛЕНИЕ: Используем replace, а не split, чтобы сохранить подчеркивания
-    option = callback.data.replace("option_", "")
-    
+@callbacks.handler(Action.TOGGLE_OPTION)
+async def toggle_option(callback: CallbackQuery, state: FSMContext, option: str):
     data = await state.get_data()
     options = data.get('options', {'exclude_similar': False, 'require_all_types': False, 'no_repeats': False})
     
@@ -336,10 +295,10 @@ async def toggle_option(callback: CallbackQuery, state: FSMContext):
     options[option] = not options.get(option, False)
     
     await state.update_data(options=options)
-    await callback.message.edit_reply_markup(reply_markup=options_kb(options))
     await callback.answer()
+    await edit_coalescer.edit_markup(callback.message, options_kb(options))
 
-@router.callback_query(F.data == "to_preview")
+@callbacks.handler(Action.TO_PREVIEW)
 async def to_preview(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     options = data.get('options', {})
@@ -369,24 +328,30 @@ async def to_preview(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 def get_preview_text(params: Dict[str, Any]) -> str:
-    # Игнорируем time_estimate (второй параметр), он нам больше не нужен
-    security_name, _, combinations = PasswordGenerator.calculate_security(params)
-    
-    if combinations >= 10**24: combs = f"{combinations / 10**24:.1f}×10²⁴"
-    elif combinations >= 10**6: combs = f"{combinations / 10**6:.1f}×10⁶"
-    else: combs = f"{combinations:,}"
-    
+    estimate = PasswordGenerator.estimate_security(params)
+    
+    if params.get('mode') == 'passphrase':
+        separator = params['separator']
+        separator_text = f"`{separator}`" if separator.strip() else ("пробел" if separator else "нет")
+        return (
+            f"📊 *Предпросмотр параметров*\n\n"
+            f"• **Слов:** {params['word_count']} (словарь: {len(wordlist)})\n"
+            f"• **Разделитель:** {separator_text}\n"
+            f"• **Комбинации:** {estimate.combinations_text}\n"
+            f"• **Надёжность:** {estimate.security_name}\n\n"
+            f"*Сгенерировать фразу?*"
+        )
     return (
         f"📊 *Предпросмотр параметров*\n\n"
         f"• **Количество символов:** {params['length']}\n"
-        f"• **Комбинации:** {combs}\n"
-        f"• **Надёжность:** {security_name}\n\n"
+        f"• **Комбинации:** {estimate.combinations_text}\n"
+        f"• **Надёжность:** {estimate.security_name}\n\n"
         f"*Сгенерировать пароль?*"
     )
 
 # ========== GENERATION ==========
 
-@router.callback_query(F.data == "generate")
+@callbacks.handler(Action.GENERATE)
 async def generate_password(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     params = data.get('params', {})
@@ -400,35 +365,37 @@ async def generate_password(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 async def generate_and_send_password(message: Message, params: Dict[str, Any], state: FSMContext):
+    """Сначала ответ пользователю (одно сообщение), запись в БД — в фоне"""
     password = PasswordGenerator.generate_password(params)
-    user_id = (await db.get_or_create_user(message.chat.id))['id']
-    await db.save_last_params(user_id, params)
-    await state.update_data(params=params)
-    
-    await message.bot.send_message(message.chat.id, f"`{password}`", parse_mode="Markdown")
-    
-    # Тут тоже убрали время и поменяли порядок
-    security_name, _, combinations = PasswordGenerator.calculate_security(params)
-    
-    if combinations >= 10**24: combs = f"{combinations / 10**24:.1f}×10²⁴"
-    elif combinations >= 10**6: combs = f"{combinations / 10**6:.1f}×10⁶"
-    else: combs = f"{combinations:,}"
+    estimate = PasswordGenerator.estimate_security(params)
     
-    details_text = (
-        f"🔐 *Пароль готов 👆*\n\n"
-        f"• Символов: {params['length']}\n"
-        f"• Комбинации: {combs}\n"
-        f"• Надёжность: {security_name}"
+    if params.get('mode') == 'passphrase':
+        title, size = "Фраза готова", f"• Слов: {params['word_count']}"
+    else:
+        title, size = "Пароль готов", f"• Символов: {params['length']}"
+    text = (
+        f"`{password}`\n\n"
+        f"🔐 *{title} 👆*\n\n"
+        f"{size}\n"
+        f"• Комбинации: {estimate.combinations_text}\n"
+        f"• Надёжность: {estimate.security_name}"
     )
-
     await message.bot.send_message(
         chat_id=message.chat.id,
-        text=details_text,
+        text=text,
         reply_markup=generated_kb(),
         parse_mode="Markdown"
     )
+    
+    # Параметры нужны следующему нажатию («Ещё один»), запись в FSM — в памяти
+    await state.update_data(params=params)
+    spawn(remember_last_params(message.chat.id, params), name="save_last_params")
 
-@router.callback_query(F.data == "generate_another")
+async def remember_last_params(telegram_id: int, params: Dict[str, Any]):
+    user_id = (await db.get_or_create_user(telegram_id))['id']
+    await db.save_last_params(user_id, params)
+
+@callbacks.handler(Action.GENERATE_ANOTHER)
 async def generate_another(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     params = data.get('params', {})
@@ -442,8 +409,12 @@ async def generate_another(callback: CallbackQuery, state: FSMContext):
         await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
     await callback.answer()
 
-@router.callback_query(F.data == "edit_params")
+@callbacks.handler(Action.EDIT_PARAMS)
 async def edit_params(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if data.get('params', {}).get('mode') == 'passphrase':
+        await new_passphrase(callback, state)
+        return
     await state.set_state(PasswordStates.SET_LENGTH)
     await callback.message.edit_text(
         f"📏 *Изменить длину пароля*\n\nВыберите новую длину:",
@@ -452,10 +423,90 @@ async def edit_params(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
+# ========== PASSPHRASE ==========
+
+@callbacks.handler(Action.NEW_PASSPHRASE)
+async def new_passphrase(callback: CallbackQuery, state: FSMContext):
+    if not wordlist.available:
+        await callback.answer("❌ Словарь для парольных фраз не установлен", show_alert=True)
+        return
+    await state.set_state(PasswordStates.SET_WORD_COUNT)
+    await callback.message.edit_text(
+        "🔤 *Шаг 1: Количество слов*\n\n"
+        "Чем больше слов, тем надёжнее фраза:",
+        reply_markup=word_count_kb(),
+        parse_mode="Markdown"
+    )
+    await callback.answer()
+
+@callbacks.handler(Action.WORD_COUNT)
+async def set_word_count(callback: CallbackQuery, state: FSMContext, word_count: int):
+    if not config.MIN_WORDS <= word_count <= config.MAX_WORDS:
+        await callback.answer(f"❌ Слов должно быть от {config.MIN_WORDS} до {config.MAX_WORDS}", show_alert=True)
+        return
+    await state.update_data(word_count=word_count)
+    await show_phrase_options(callback, state)
+
+async def show_phrase_options(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(PasswordStates.SET_PHRASE_OPTIONS)
+    data = await state.get_data()
+    await callback.message.edit_text(
+        "⚙️ *Шаг 2: Вид фразы*\n\nРазделитель между словами и оформление:",
+        reply_markup=phrase_options_kb(data.get('separator', config.DEFAULT_SEPARATOR), data.get('phrase_options')),
+        parse_mode="Markdown"
+    )
+    await callback.answer()
+
+@callbacks.handler(Action.SEPARATOR)
+async def set_separator(callback: CallbackQuery, state: FSMContext, separator: str):
+    data = await state.get_data()
+    await state.update_data(separator=separator)
+    await callback.answer()
+    await edit_coalescer.edit_markup(callback.message, phrase_options_kb(separator, data.get('phrase_options')))
+
+@callbacks.handler(Action.TOGGLE_PHRASE_OPTION)
+async def toggle_phrase_option(callback: CallbackQuery, state: FSMContext, option: str):
+    data = await state.get_data()
+    options = data.get('phrase_options', {'capitalize': False, 'add_digit': False})
+    options[option] = not options.get(option, False)
+    await state.update_data(phrase_options=options)
+    await callback.answer()
+    await edit_coalescer.edit_markup(
+        callback.message, phrase_options_kb(data.get('separator', config.DEFAULT_SEPARATOR), options)
+    )
+
+@callbacks.handler(Action.TO_PHRASE_PREVIEW)
+async def to_phrase_preview(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    options = data.get('phrase_options', {})
+    params = {
+        'mode': 'passphrase',
+        'word_count': data.get('word_count', config.DEFAULT_WORD_COUNTS[2]),
+        'separator': config.SEPARATORS[data.get('separator', config.DEFAULT_SEPARATOR)],
+        'capitalize': options.get('capitalize', False),
+        'add_digit': options.get('add_digit', False)
+    }
+    await state.update_data(params=params)
+    await state.set_state(PasswordStates.PREVIEW)
+    await callback.message.edit_text(
+        get_preview_text(params),
+        reply_markup=phrase_preview_kb(),
+        parse_mode="Markdown"
+    )
+    await callback.answer()
+
+@callbacks.handler(Action.BACK_TO_WORDS)
+async def back_to_words(callback: CallbackQuery, state: FSMContext):
+    await new_passphrase(callback, state)
+
+@callbacks.handler(Action.BACK_TO_PHRASE_OPTIONS)
+async def back_to_phrase_options(callback: CallbackQuery, state: FSMContext):
+    await show_phrase_options(callback, state)
+
 # ========== TEMPLATES (Save/Load) - ИСПРАВЛЕНО ==========
 
-# ИСПРАВЛЕНИЕ: Реагируем и на save_template (предпросмотр), и на save_current (после генерации)
-@router.callback_query(F.data.in_({"save_template", "save_current"}))
+# Одно действие и для предпросмотра, и для экрана после генерации
+@callbacks.handler(Action.SAVE_TEMPLATE)
 async def save_template_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(PasswordStates.SAVE_TEMPLATE_NAME)
     await callback.message.edit_text(
@@ -490,11 +541,9 @@ async def save_template_finish(message: Message, state: FSMContext):
             logger.error(f"Template save error: {e}")
             await message.answer("❌ Ошибка при сохранении", reply_markup=back_to_main_kb())
 
-@router.callback_query(F.data.startswith("template_"))
-async def template_selected(callback: CallbackQuery, state: FSMContext):
-    t_id = int(callback.data.split("_")[1])
-    user_id = (await db.get_or_create_user(callback.from_user.id))['id']
-    template = await db.get_template(t_id, user_id)
+@callbacks.handler(Action.TEMPLATE)
+async def template_selected(callback: CallbackQuery, state: FSMContext, t_id: int):
+    template = await db.get_template_for_telegram_user(t_id, callback.from_user.id)
     
     if not template:
         await callback.answer("❌ Шаблон не найден", show_alert=True)
@@ -507,52 +556,47 @@ async def template_selected(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("use_template_"))
-async def use_template(callback: CallbackQuery, state: FSMContext):
-    t_id = int(callback.data.split("_")[2])
-    user_id = (await db.get_or_create_user(callback.from_user.id))['id']
-    template = await db.get_template(t_id, user_id)
+@callbacks.handler(Action.USE_TEMPLATE)
+async def use_template(callback: CallbackQuery, state: FSMContext, t_id: int):
+    template = await db.get_template_for_telegram_user(t_id, callback.from_user.id)
     
     if not template:
         await callback.answer("❌ Шаблон не найден", show_alert=True)
         return
     
-    params = {
-        'length': template['length'],
-        'include_digits': template['include_digits'],
-        'include_lowercase': template['include_lowercase'],
-        'include_uppercase': template['include_uppercase'],
-        'include_special': template['include_special'],
-        'exclude_similar': template['exclude_similar'],
-        'require_all_types': template['require_all_types'],
-        'no_repeats': template['no_repeats']
-    }
+    params = params_from_row(template)
     await state.update_data(params=params)
-    await generate_and_send_password(callback.message, params, state)
+    try:
+        await generate_and_send_password(callback.message, params, state)
+    except ValueError as e:
+        await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
+        return
     await callback.answer()
 
-@router.callback_query(F.data.startswith("delete_template_"))
-async def delete_template(callback: CallbackQuery):
-    t_id = int(callback.data.split("_")[2])
-    user_id = (await db.get_or_create_user(callback.from_user.id))['id']
-    await db.delete_template(t_id, user_id)
+@callbacks.handler(Action.DELETE_TEMPLATE)
+async def delete_template(callback: CallbackQuery, state: FSMContext, t_id: int):
+    await db.delete_template_for_telegram_user(t_id, callback.from_user.id)
     
-    templates = await db.get_user_templates(user_id)
-    if not templates:
+    user_id = (await db.get_or_create_user(callback.from_user.id))['id']
+    page = await db.get_templates_page(user_id)
+    if not page.items:
         await callback.message.edit_text("✅ Шаблон удален! Шаблонов больше нет.", reply_markup=back_to_main_kb())
     else:
-        await callback.message.edit_text("✅ Шаблон удален! Выберите другой:", reply_markup=templates_kb(templates))
+        await callback.message.edit_text(
+            "✅ Шаблон удален! Выберите другой:",
+            reply_markup=templates_kb(page.items, page.has_prev, page.has_next)
+        )
     await callback.answer()
 
 # ========== NAVIGATION BACK ==========
 
-@router.callback_query(F.data == "back_to_length")
+@callbacks.handler(Action.BACK_TO_LENGTH)
 async def back_to_length(callback: CallbackQuery, state: FSMContext):
     await state.set_state(PasswordStates.SET_LENGTH)
     await callback.message.edit_text("📏 *Шаг 1: Длина пароля*", reply_markup=length_kb(), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_chars")
+@callbacks.handler(Action.BACK_TO_CHARS)
 async def back_to_chars(callback: CallbackQuery, state: FSMContext):
     await state.set_state(PasswordStates.SET_CHAR_TYPES)
     data = await state.get_data()
@@ -565,7 +609,7 @@ async def back_to_chars(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("🔠 *Шаг 2: Типы символов*", reply_markup=char_types_kb(char_types), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_options")
+@callbacks.handler(Action.BACK_TO_OPTIONS)
 async def back_to_options(callback: CallbackQuery, state: FSMContext):
     await state.set_state(PasswordStates.SET_OPTIONS)
     data = await state.get_data()
@@ -577,18 +621,82 @@ async def back_to_options(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("⚙️ *Шаг 3: Дополнительные опции*", reply_markup=options_kb(options), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_templates")
+@callbacks.handler(Action.BACK_TO_TEMPLATES)
 async def back_to_templates(callback: CallbackQuery, state: FSMContext):
     await my_templates(callback, state)
 
+# ========== INLINE MODE ==========
+
+@router.inline_query()
+async def inline_generate(inline_query: InlineQuery):
+    """@bot 16 dlus — несколько готовых паролей прямо в любом чате"""
+    parsed = parse_query(inline_query.query)
+    spec = get_spec(*parsed) if parsed is not None else None
+    if spec is None or spec.error is not None:
+        text = f"❌ {spec.error}" if spec is not None else SPEC_HELP
+        await inline_query.answer([], cache_time=0, is_personal=True,
+                                  button=InlineQueryResultsButton(text=text, start_parameter="inline"))
+        return
+    await inline_query.answer(build_results(spec, config.INLINE_RESULTS), cache_time=0, is_personal=True)
+
 # ========== ADMIN COMMANDS ==========
 
 @router.message(Command("stats"))
 async def cmd_stats(message: Message):
     if message.from_user.id not in config.ADMIN_IDS: return
-    async with db.pool.acquire() as conn:
+    async with db.acquire() as conn:
         stats = await conn.fetchrow("SELECT COUNT(*) as u, COUNT(DISTINCT DATE(created_at)) as d FROM users")
-    await message.answer(f"📊 *Статистика*\nПользователей: {stats['u']}\nДней работы: {stats['d']}", parse_mode="Markdown")
+    cache = db.user_cache
+    hit_rate = f"{cache.hit_rate:.0%}" if cache.hit_rate is not None else "—"
+    pool = db.pool_stats
+    throttled = ", ".join(f"{group} {limiter.rejected}" for group, limiter in throttler.limiters.items())
+    await message.answer(
+        f"📊 *Статистика*\nПользователей: {stats['u']}\nДней работы: {stats['d']}\n"
+        f"Кэш пользователей: {len(cache)} (попадания: {cache.hits}, промахи: {cache.misses}, {hit_rate})\n"
+        f"Пул БД: {db.pool.get_size()}/{config.DB_POOL_MAX_SIZE}, занято {pool.in_use} (пик {pool.in_use_peak}), "
+        f"ожидание ср. {pool.wait_avg * 1000:.1f} мс / макс. {pool.wait_max * 1000:.1f} мс, таймаутов {pool.timeouts}\n"
+        f"Ограничение частоты: отклонено {throttled}, пользователей в лимите {throttler.tracked}\n"
+        f"Очередь апдейтов: {scheduler.pending} в ожидании, пользователей {scheduler.users}, "
+        f"воркеров занято {scheduler.busy}/{scheduler.workers}, ожидание ср. {scheduler.wait_avg * 1000:.1f} мс "
+        f"/ макс. {scheduler.wait_max * 1000:.1f} мс\n"
+        f"Фоновые задачи: {background.pending()}",
+        parse_mode="Markdown"
+    )
+
+@router.message(Command("slow"))
+async def cmd_slow(message: Message, command: CommandObject):
+    """/slow — самые медленные апдейты, /slow N — профиль N-го файлом, /slow reset — сброс"""
+    if message.from_user.id not in config.ADMIN_IDS: return
+    top = profiler.top()
+    arg = (command.args or "").strip()
+    
+    if arg == "reset":
+        profiler.reset()
+        await message.answer("🧹 Список медленных апдейтов очищен")
+        return
+    
+    if arg.isdigit():
+        index = int(arg) - 1
+        if not 0 <= index < len(top) or not top[index].profile_path or not os.path.exists(top[index].profile_path):
+            await message.answer("❌ Для этого апдейта нет профиля")
+            return
+        await message.answer_document(
+            FSInputFile(top[index].profile_path),
+            caption="Открыть: python -m pstats <файл>, затем sort cumulative / stats 30"
+        )
+        return
+    
+    lines = [
+        f"🐢 *Медленные апдейты* (порог {profiler.threshold * 1000:.0f} мс)",
+        f"Всего: {profiler.updates}, медленных: {profiler.slow_updates}, профилей: {profiler.profiles_written}",
+    ]
+    for i, slow in enumerate(top[:10], 1):
+        phases = ", ".join(f"{k} {v * 1000:.0f}" for k, v in slow.phases.items())
+        mark = " 📄" if slow.profile_path else ""
+        lines.append(f"{i}. `{slow.name}` — {slow.total * 1000:.0f} мс ({phases}){mark}")
+    if not top:
+        lines.append("Пока ничего")
+    await message.answer("\n".join(lines), parse_mode="Markdown")
 
 # === ВЕБ-СЕРВЕР ДЛЯ RENDER (Health Check) ===
 
@@ -596,11 +704,26 @@ async def health_check(request):
     """Простой ответ на пинг"""
     return web.Response(text="I'm alive! Bot is running.")
 
-async def start_web_server():
-    """Запуск веб-сервера в фоне"""
+async def metrics_handler(request):
+    """Метрики в текстовом формате Prometheus"""
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+async def start_web_server(bot: Bot = None) -> web.AppRunner:
+    """Запуск веб-сервера в фоне (с приёмом вебхуков, если передан bot)"""
     app = web.Application()
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics_handler)
+    
+    if bot is not None:
+        # Отвечаем Telegram 200 сразу, апдейт обрабатывается в фоне
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=config.WEBHOOK_SECRET
+        ).register(app, path=config.WEBHOOK_PATH)
     
     runner = web.AppRunner(app)
     await runner.setup()
@@ -609,11 +732,18 @@ async def start_web_server():
     site = web.TCPSite(runner, '0.0.0.0', port)
     await site.start()
     logging.info(f"🌐 Веб-сервер запущен на порту {port}")
+    return runner
 
 # === MAIN EXECUTION ===
 
 async def on_shutdown(dispatcher: Dispatcher):
     logging.warning("🛑 Бот останавливается...")
+    await scheduler.close(config.SCHEDULER_DRAIN_TIMEOUT)
+    await edit_coalescer.close()
+    await background.drain()
+    if isinstance(storage, PostgresStorage):
+        # Хранилище уже закрыто aiogram; изменения, сделанные после этого, ещё в буфере
+        await storage.flush()
     await db.close()
 
 async def main():
@@ -631,6 +761,7 @@ async def main():
     # --- DEBUG END ---
 
     bot = Bot(token=config.BOT_TOKEN)
+    bot.session.middleware(ApiMetricsMiddleware())
 
     try:
         await db.connect()
@@ -640,6 +771,11 @@ async def main():
 
     dp.shutdown.register(on_shutdown)
     
+    if config.DELIVERY_MODE == "webhook":
+        if await run_webhook(bot):
+            return
+        logging.warning("↩️ Переключаемся на polling")
+    
     # Запускаем веб-сервер
     await start_web_server()
     
@@ -661,5 +797,44 @@ async def main():
     except Exception as e:
         logging.error(f"Ошибка polling: {e}")
 
+async def run_webhook(bot: Bot) -> bool:
+    """Работа через вебхук. Возвращает False, если вебхук не удалось установить"""
+    if not config.WEBHOOK_BASE_URL:
+        logging.error("⚠️ WEBHOOK_BASE_URL не задан")
+        return False
+    
+    webhook_url = config.WEBHOOK_BASE_URL.rstrip("/") + config.WEBHOOK_PATH
+    try:
+        await bot.set_webhook(
+            webhook_url,
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True
+        )
+        logging.info(f"🪝 Вебхук установлен: {webhook_url}")
+    except TelegramUnauthorizedError:
+        logging.critical("❌ ОШИБКА АВТОРИЗАЦИИ! Токен неверный. Сверьте первые/последние символы в логах.")
+        return True
+    except Exception as e:
+        logging.error(f"⚠️ Ошибка установки вебхука: {e}")
+        return False
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    await dp.emit_startup(bot=bot)
+    runner = await start_web_server(bot)
+    try:
+        await stop_event.wait()
+    finally:
+        # Сначала перестаём принимать вебхуки, затем on_shutdown дорабатывает очередь апдейтов
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        # runner.cleanup закрывает сессию, но дорабатывающие апдейты открывают её заново
+        await bot.session.close()
+    return True
+
 if __name__ == "__main__":
     asyncio.run(main())
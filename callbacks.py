@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery
+
+from config import config
+
+# Формат callback_data: "<версия>:<код действия>[:<аргумент>]".
+# При несовместимом изменении формата версию нужно увеличить —
+# кнопки из старых сообщений тогда распознаются как устаревшие.
+CALLBACK_VERSION = "1"
+SEPARATOR = ":"
+
+CHAR_TYPE_KEYS = frozenset({'digits', 'lowercase', 'uppercase', 'special'})
+OPTION_KEYS = frozenset({'exclude_similar', 'require_all_types', 'no_repeats'})
+SEPARATOR_KEYS = frozenset(config.SEPARATORS)
+PHRASE_OPTION_KEYS = frozenset({'capitalize', 'add_digit'})
+
+
+class Action(str, Enum):
+    """Коды действий (короткие — callback_data ограничена 64 байтами)"""
+    HELP = "h"
+    BACK_TO_MAIN = "m"
+    NEW_PASSWORD = "n"
+    LAST_PARAMS = "l"
+    MY_TEMPLATES = "t"
+    TEMPLATES_PAGE = "tp"
+    LENGTH = "L"
+    CUSTOM_LENGTH = "c"
+    TOGGLE_CHAR_TYPE = "T"
+    TO_OPTIONS = "o"
+    TOGGLE_OPTION = "O"
+    TO_PREVIEW = "p"
+    GENERATE = "g"
+    GENERATE_ANOTHER = "a"
+    EDIT_PARAMS = "e"
+    SAVE_TEMPLATE = "s"
+    NEW_TEMPLATE = "N"
+    TEMPLATE = "S"
+    USE_TEMPLATE = "u"
+    DELETE_TEMPLATE = "d"
+    RENAME_TEMPLATE = "r"
+    BACK_TO_LENGTH = "bl"
+    BACK_TO_CHARS = "bc"
+    BACK_TO_OPTIONS = "bo"
+    BACK_TO_TEMPLATES = "bt"
+    NEW_PASSPHRASE = "P"
+    WORD_COUNT = "W"
+    SEPARATOR = "sp"
+    TOGGLE_PHRASE_OPTION = "F"
+    TO_PHRASE_PREVIEW = "pp"
+    BACK_TO_WORDS = "bw"
+    BACK_TO_PHRASE_OPTIONS = "bf"
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0 or str(number) != value:
+        raise ValueError(value)
+    return number
+
+
+def _one_of(keys: frozenset) -> Callable[[str], str]:
+    def parse(value: str) -> str:
+        if value not in keys:
+            raise ValueError(value)
+        return value
+    return parse
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class PageCursor(NamedTuple):
+    """Позиция для keyset-пагинации по (created_at DESC, id DESC)"""
+    backward: bool          # True — страница перед ключом, False — после
+    created_at: datetime
+    id: int
+
+    def __str__(self) -> str:
+        # created_at кодируется микросекундами от эпохи, чтобы уложиться в 64 байта
+        micros = (self.created_at - EPOCH) // timedelta(microseconds=1)
+        return f"{'p' if self.backward else 'n'}{micros}.{self.id}"
+
+
+def _page_cursor(value: str) -> PageCursor:
+    if value[:1] not in ('p', 'n'):
+        raise ValueError(value)
+    micros, _, template_id = value[1:].partition('.')
+    return PageCursor(value[0] == 'p', EPOCH + timedelta(microseconds=int(micros)), _positive_int(template_id))
+
+
+# Парсеры аргументов; действия без записи аргумента не принимают
+ARG_PARSERS: Dict[Action, Callable[[str], Any]] = {
+    Action.LENGTH: _positive_int,
+    Action.TOGGLE_CHAR_TYPE: _one_of(CHAR_TYPE_KEYS),
+    Action.TOGGLE_OPTION: _one_of(OPTION_KEYS),
+    Action.WORD_COUNT: _positive_int,
+    Action.SEPARATOR: _one_of(SEPARATOR_KEYS),
+    Action.TOGGLE_PHRASE_OPTION: _one_of(PHRASE_OPTION_KEYS),
+    Action.TEMPLATES_PAGE: _page_cursor,
+    Action.TEMPLATE: _positive_int,
+    Action.USE_TEMPLATE: _positive_int,
+    Action.DELETE_TEMPLATE: _positive_int,
+    Action.RENAME_TEMPLATE: _positive_int,
+}
+
+_ACTIONS_BY_CODE = {action.value: action for action in Action}
+
+
+class CallbackCommand(NamedTuple):
+    action: Action
+    arg: Any = None
+
+
+def pack(action: Action, arg: Any = None) -> str:
+    """Упаковать действие в callback_data"""
+    if (arg is None) != (action not in ARG_PARSERS):
+        raise ValueError(f"Неверный аргумент для {action.name}: {arg!r}")
+    data = f"{CALLBACK_VERSION}{SEPARATOR}{action.value}"
+    if arg is not None:
+        data += f"{SEPARATOR}{arg}"
+    return data
+
+
+def unpack(data: Optional[str]) -> Optional[CallbackCommand]:
+    """Разобрать callback_data; None — если данные устарели или некорректны"""
+    if not data:
+        return None
+    parts = data.split(SEPARATOR, 2)
+    if parts[0] != CALLBACK_VERSION or len(parts) < 2:
+        return None
+    action = _ACTIONS_BY_CODE.get(parts[1])
+    if action is None:
+        return None
+
+    parser = ARG_PARSERS.get(action)
+    if parser is None:
+        return CallbackCommand(action) if len(parts) == 2 else None
+    if len(parts) != 3:
+        return None
+    try:
+        return CallbackCommand(action, parser(parts[2]))
+    except (ValueError, OverflowError):
+        return None
+
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class CallbackDispatcher:
+    """Единая таблица обработчиков callback-кнопок: поиск по коду действия за O(1)"""
+
+    def __init__(self):
+        self.handlers: Dict[Action, Handler] = {}
+
+    def handler(self, *actions: Action) -> Callable[[Handler], Handler]:
+        def decorator(func: Handler) -> Handler:
+            for action in actions:
+                if action in self.handlers:
+                    raise ValueError(f"Обработчик для {action.name} уже зарегистрирован")
+                self.handlers[action] = func
+            return func
+        return decorator
+
+    async def dispatch(self, callback: CallbackQuery, state: FSMContext):
+        command = unpack(callback.data)
+        if command is None:
+            await callback.answer("⚠️ Кнопка устарела. Откройте меню заново: /start", show_alert=True)
+            return
+        handler = self.handlers.get(command.action)
+        if handler is None:
+            await callback.answer()
+            return
+        if command.action in ARG_PARSERS:
+            return await handler(callback, state, command.arg)
+        return await handler(callback, state)
@@ -1,18 +1,112 @@
 import os
+import hashlib
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def _rate_limit(name: str, default: str) -> tuple:
+    """Лимит из переменной окружения в формате "<запросов в секунду>/<всплеск>" """
+    rate, burst = os.getenv(name, default).split("/")
+    return float(rate), int(burst)
+
 class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     DATABASE_URL = os.getenv("DATABASE_URL")
     ADMIN_IDS = [int(id.strip()) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip()]
     
+    # Получение обновлений: "polling" или "webhook"
+    DELIVERY_MODE = os.getenv("DELIVERY_MODE", "polling")
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL") or os.getenv("RENDER_EXTERNAL_URL")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    # Секрет по умолчанию выводится из токена, чтобы совпадать на всех инстансах
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or (
+        hashlib.sha256(BOT_TOKEN.encode()).hexdigest()[:32] if BOT_TOKEN else None
+    )
+    
+    # Пул соединений с БД. Пулер Supabase в режиме transaction не поддерживает
+    # подготовленные запросы, поэтому кэш выражений включается только в режиме session
+    # (прямое подключение или пулер в session-режиме)
+    DB_POOL_MODE = os.getenv("DB_POOL_MODE", "transaction")
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 5))
+    DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 10))
+    DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", 300))
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))  # только для session
+    
+    # Кэш пользователей (telegram_id -> users.id)
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 3600))
+    LAST_ACTIVE_INTERVAL = int(os.getenv("LAST_ACTIVE_INTERVAL", 300))  # секунд между обновлениями last_active
+    
+    # Кэш шаблонов (users.id -> все шаблоны пользователя)
+    TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", 1000))
+    TEMPLATE_CACHE_TTL = int(os.getenv("TEMPLATE_CACHE_TTL", 900))
+    TEMPLATE_CACHE_MAX_ITEMS = int(os.getenv("TEMPLATE_CACHE_MAX_ITEMS", 200))  # больше — только постраничные запросы
+    
+    # Отложенная запись (write-behind) в БД
+    FLUSH_INTERVAL = float(os.getenv("FLUSH_INTERVAL", 5))  # секунд между сбросами буферов
+    FLUSH_BATCH_SIZE = int(os.getenv("FLUSH_BATCH_SIZE", 100))  # досрочный сброс при таком числе записей
+    
+    # FSM-хранилище: "postgres" (переживает рестарты) или "memory"
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "postgres")
+    # Несколько инстансов на одной БД: состояние читается и пишется в Postgres без
+    # локального кэша и отложенной записи (медленнее, но инстансы видят одно и то же)
+    FSM_SHARED = os.getenv("FSM_SHARED", "0") == "1"
+    FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", 10000))
+    FSM_CACHE_TTL = int(os.getenv("FSM_CACHE_TTL", 600))
+    
+    # Планировщик апдейтов: очередь на пользователя + ограниченный пул воркеров
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+    SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 32))  # апдейтов, обрабатываемых одновременно
+    SCHEDULER_DRAIN_TIMEOUT = float(os.getenv("SCHEDULER_DRAIN_TIMEOUT", 20))  # секунд на разбор очередей при остановке
+    
+    # Ограничение частоты запросов на пользователя (token bucket), по группам действий
+    THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1") == "1"
+    THROTTLE_LIMITS = {
+        "generate": _rate_limit("THROTTLE_GENERATE", "1/3"),   # генерация: DB + два сообщения
+        "toggle": _rate_limit("THROTTLE_TOGGLE", "5/10"),      # переключатели типов и опций
+        "callback": _rate_limit("THROTTLE_CALLBACK", "3/10"),  # остальные кнопки
+        "message": _rate_limit("THROTTLE_MESSAGE", "2/5"),     # текстовые сообщения и команды
+        "inline": _rate_limit("THROTTLE_INLINE", "3/10"),      # inline-запросы (на каждое изменение текста)
+    }
+    THROTTLE_SWEEP_INTERVAL = float(os.getenv("THROTTLE_SWEEP_INTERVAL", 60))  # очистка простаивающих, с
+    
+    # Окно объединения правок клавиатуры при быстрых нажатиях переключателей, с (0 — сразу)
+    EDIT_DEBOUNCE = float(os.getenv("EDIT_DEBOUNCE", 0.4))
+    
+    # Профилирование медленных апдейтов (/slow)
+    SLOW_UPDATE_THRESHOLD = float(os.getenv("SLOW_UPDATE_THRESHOLD", 1.0))  # секунд
+    # cProfile замедляет весь процесс, поэтому по умолчанию выключен (0). Иначе после медленного
+    # апдейта профилируется следующий апдейт того же типа, не чаще раза в PROFILE_INTERVAL секунд
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0))
+    PROFILE_TOP_SIZE = int(os.getenv("PROFILE_TOP_SIZE", 20))
+    # Профили — служебные файлы, не в рабочем каталоге (и не в репозитории)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "passgen-profiles"))
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))
+    
     # Параметры генерации
     MIN_LENGTH = 4
     MAX_LENGTH = 50
     DEFAULT_LENGTHS = [8, 12, 16, 20, 24, 32]
     
+    # Inline-режим: "@bot 16 dlus" (включается в @BotFather → /setinline)
+    INLINE_DEFAULT_LENGTH = int(os.getenv("INLINE_DEFAULT_LENGTH", 16))
+    INLINE_DEFAULT_FLAGS = os.getenv("INLINE_DEFAULT_FLAGS", "dlus")
+    INLINE_RESULTS = int(os.getenv("INLINE_RESULTS", 5))  # вариантов пароля в ответе
+    INLINE_QUERY_CACHE_SIZE = int(os.getenv("INLINE_QUERY_CACHE_SIZE", 4096))  # разобранных строк запроса
+    
+    # Парольные фразы: слова из словаря (собирается командой python wordlist.py <список слов>)
+    WORDLIST_PATH = os.getenv("WORDLIST_PATH", "wordlist.bin")
+    MIN_WORDS = 3
+    MAX_WORDS = 12
+    DEFAULT_WORD_COUNTS = [4, 5, 6, 7, 8, 10]
+    DEFAULT_SEPARATOR = "dash"
+    SEPARATORS = {"dash": "-", "underscore": "_", "dot": ".", "space": " ", "none": ""}
+    
+    # Шаблонов на одной странице списка
+    TEMPLATES_PAGE_SIZE = int(os.getenv("TEMPLATES_PAGE_SIZE", 8))
+    
     # Символы для генерации
     DIGITS = "0123456789"
     LOWERCASE = "abcdefghijklmnopqrstuvwxyz"
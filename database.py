@@ -1,36 +1,237 @@
+import asyncio
 import asyncpg
+import time
+from contextlib import asynccontextmanager
 from config import config
-from typing import List, Dict, Any, Optional
+from cache import TTLCache
+from metrics import DB_POOL_WAIT_SECONDS, DB_QUERY_SECONDS, GaugeFunc, timed
+from profiling import phase
+from datetime import datetime
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 import logging
 
+# Булевы параметры генерации в порядке столбцов таблиц templates/last_params
+PARAM_FLAGS = (
+    'include_digits', 'include_lowercase', 'include_uppercase', 'include_special',
+    'exclude_similar', 'require_all_types', 'no_repeats'
+)
+# Параметры парольной фразы (mode = 'passphrase'); для паролей — NULL/FALSE
+PASSPHRASE_FIELDS = ('word_count', 'separator', 'capitalize', 'add_digit')
+# Все столбцы параметров в порядке таблиц templates/last_params
+PARAM_COLUMNS = ('length',) + PARAM_FLAGS + ('mode',) + PASSPHRASE_FIELDS
+
+def params_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Параметры генерации из строки templates/last_params"""
+    if row.get('mode') == 'passphrase':
+        return {'mode': 'passphrase', **{key: row[key] for key in PASSPHRASE_FIELDS}}
+    return {key: row[key] for key in ('length',) + PARAM_FLAGS}
+
+class PoolStats:
+    """Статистика пула: ожидание соединения и занятость"""
+    
+    def __init__(self):
+        self.acquires = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use = 0
+        self.in_use_peak = 0
+    
+    def record_acquire(self, wait: float):
+        DB_POOL_WAIT_SECONDS.observe(wait)
+        self.acquires += 1
+        self.wait_total += wait
+        if wait > self.wait_max:
+            self.wait_max = wait
+        self.in_use += 1
+        if self.in_use > self.in_use_peak:
+            self.in_use_peak = self.in_use
+    
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.acquires if self.acquires else 0.0
+
+class TemplatePage(NamedTuple):
+    items: List[Dict]       # только id, name, length, word_count, created_at
+    has_prev: bool
+    has_next: bool
+
+class CachedTemplates(NamedTuple):
+    items: List[Dict]       # в порядке (created_at DESC, id DESC)
+    by_id: Dict[int, Dict]
+
+    @classmethod
+    def build(cls, items: List[Dict]) -> "CachedTemplates":
+        items = sorted(items, key=_template_key, reverse=True)
+        return cls(items, {t['id']: t for t in items})
+
+# Метка в кэше: у пользователя больше TEMPLATE_CACHE_MAX_ITEMS шаблонов, работаем через постраничные запросы
+_TOO_MANY_TEMPLATES = CachedTemplates([], {})
+
+def _template_key(template: Dict) -> Tuple[datetime, int]:
+    return template['created_at'], template['id']
+
 class Database:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self.pool_stats = PoolStats()
+        # telegram_id -> (dict пользователя, время последнего обновления last_active)
+        self.user_cache = TTLCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+        # users.id -> CachedTemplates; пользователи с очень большим числом шаблонов не кэшируются
+        self.template_cache = TTLCache(config.TEMPLATE_CACHE_SIZE, config.TEMPLATE_CACHE_TTL)
+        # Буфер активности: telegram_id -> (username, unix-время)
+        self._activity_buffer: Dict[int, tuple] = {}
+        # Буфер последних параметров: users.id -> params (хранится только последняя версия)
+        self._last_params_buffer: Dict[int, Dict[str, Any]] = {}
+        # Пачки, которые сейчас записываются в БД (видны читателям до окончания записи)
+        self._inflight: Dict[str, Dict] = {}
+        self._flush_event = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = False
     
-    async def connect(self):
-        """Подключение к базе данных с лимитами для Supabase"""
+    async def connect(self, pool: Optional[asyncpg.Pool] = None):
+        """Подключение к базе данных с лимитами для Supabase (или к готовому пулу, например из loadtest.py)"""
         try:
-            self.pool = await asyncpg.create_pool(
+            session_mode = config.DB_POOL_MODE == "session"
+            self.pool = pool or await asyncpg.create_pool(
                 config.DATABASE_URL,
-                min_size=1,
-                max_size=5,
-                statement_cache_size=0  # <--- ДОБАВЬ ВОТ ЭТУ СТРОЧКУ ОБЯЗАТЕЛЬНО
+                min_size=config.DB_POOL_MIN_SIZE,
+                max_size=config.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=config.DB_MAX_INACTIVE_LIFETIME,
+                # В transaction-режиме пулера кэш подготовленных выражений должен быть выключен
+                statement_cache_size=config.DB_STATEMENT_CACHE_SIZE if session_mode else 0
             )
             await self._create_tables()
+            self._closing = False
+            self._flush_task = asyncio.create_task(self._flush_loop())
             logging.info("✅ Успешное подключение к базе данных")
         except Exception as e:
             logging.error(f"❌ Критическая ошибка подключения к БД: {e}")
             raise e
     
+    @asynccontextmanager
+    async def acquire(self):
+        """Соединение из пула с учётом времени ожидания и числа занятых соединений"""
+        with phase("db"):
+            started = time.perf_counter()
+            try:
+                conn = await self.pool.acquire(timeout=config.DB_ACQUIRE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.pool_stats.timeouts += 1
+                raise
+            self.pool_stats.record_acquire(time.perf_counter() - started)
+            try:
+                yield conn
+            finally:
+                self.pool_stats.in_use -= 1
+                await self.pool.release(conn)
+    
     async def close(self):
         """Закрытие пула соединений (Graceful Shutdown)"""
+        if self._flush_task:
+            # Цикл не отменяется: запись, идущая сейчас, должна завершиться
+            self._closing = True
+            self._flush_event.set()
+            await self._flush_task
+            self._flush_task = None
         if self.pool:
+            await self.flush()
             await self.pool.close()
             logging.info("💤 Соединение с БД закрыто")
 
+    async def _flush_loop(self):
+        """Фоновый сброс буферов: по таймеру или при переполнении"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=config.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+    
+    def _buffer_put(self, buffer: Dict, key: Any, value: Any):
+        buffer[key] = value
+        if len(buffer) >= config.FLUSH_BATCH_SIZE:
+            self._flush_event.set()
+    
+    async def flush(self):
+        """Сбросить отложенные записи в БД одним executemany на буфер"""
+        # Пустые сбросы по таймеру в метрику не попадают
+        if not self._activity_buffer and not self._last_params_buffer:
+            return
+        with DB_QUERY_SECONDS.time("flush"):
+            await self._flush_all()
+
+    async def _flush_all(self):
+        await self._flush_buffer(
+            '_activity_buffer',
+            "UPDATE users SET last_active = to_timestamp($3), username = $2 WHERE telegram_id = $1",
+            lambda telegram_id, value: (telegram_id, *value)
+        )
+        await self._flush_buffer(
+            '_last_params_buffer',
+            """
+            INSERT INTO last_params 
+            (user_id, length, include_digits, include_lowercase, 
+             include_uppercase, include_special, exclude_similar, 
+             require_all_types, no_repeats,
+             mode, word_count, separator, capitalize, add_digit)
+            SELECT $1::int, $2::int, $3::bool, $4::bool, $5::bool, $6::bool, $7::bool, $8::bool, $9::bool,
+                   $10::varchar, $11::int, $12::varchar, $13::bool, $14::bool
+            WHERE EXISTS (SELECT 1 FROM users WHERE id = $1)
+            ON CONFLICT (user_id) DO UPDATE SET
+                length = EXCLUDED.length,
+                include_digits = EXCLUDED.include_digits,
+                include_lowercase = EXCLUDED.include_lowercase,
+                include_uppercase = EXCLUDED.include_uppercase,
+                include_special = EXCLUDED.include_special,
+                exclude_similar = EXCLUDED.exclude_similar,
+                require_all_types = EXCLUDED.require_all_types,
+                no_repeats = EXCLUDED.no_repeats,
+                mode = EXCLUDED.mode,
+                word_count = EXCLUDED.word_count,
+                separator = EXCLUDED.separator,
+                capitalize = EXCLUDED.capitalize,
+                add_digit = EXCLUDED.add_digit,
+                updated_at = NOW()
+            """,
+            lambda user_id, params: (user_id, *params.values())
+        )
+    
+    async def _flush_buffer(self, attr: str, query: str, to_row):
+        batch = getattr(self, attr)
+        if not batch:
+            return
+        setattr(self, attr, {})
+        self._inflight[attr] = batch
+        try:
+            async with self.acquire() as conn:
+                await conn.executemany(query, [to_row(key, value) for key, value in batch.items()])
+        except (Exception, asyncio.CancelledError) as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logging.error(f"❌ Ошибка отложенной записи ({attr}): {e}")
+            # Возвращаем в буфер то, что не было перезаписано более свежими данными
+            # (и при отмене: иначе пачка не попадёт ни в БД, ни в финальный flush)
+            buffer = getattr(self, attr)
+            for key, value in batch.items():
+                buffer.setdefault(key, value)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self._inflight.pop(attr, None)
+    
+    @staticmethod
+    def _params_values(params: Dict[str, Any]) -> tuple:
+        return (
+            (params.get('length'),)
+            + tuple(params.get(field, False) for field in PARAM_FLAGS)
+            + (params.get('mode', 'password'), params.get('word_count'), params.get('separator'),
+               params.get('capitalize', False), params.get('add_digit', False))
+        )
+
     async def _create_tables(self):
         """Создание таблиц если они не существуют"""
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             # Таблица пользователей
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS users (
@@ -78,114 +279,331 @@ class Database:
                     updated_at TIMESTAMP DEFAULT NOW()
                 )
             """)
+            
+            # Парольные фразы: столбцы добавляются и в существующие таблицы,
+            # length у фраз пустой (у них word_count)
+            for table in ('templates', 'last_params'):
+                await conn.execute(f"""
+                    ALTER TABLE {table}
+                    ALTER COLUMN length DROP NOT NULL,
+                    ADD COLUMN IF NOT EXISTS mode VARCHAR(10) NOT NULL DEFAULT 'password',
+                    ADD COLUMN IF NOT EXISTS word_count INTEGER,
+                    ADD COLUMN IF NOT EXISTS separator VARCHAR(3),
+                    ADD COLUMN IF NOT EXISTS capitalize BOOLEAN DEFAULT FALSE,
+                    ADD COLUMN IF NOT EXISTS add_digit BOOLEAN DEFAULT FALSE
+                """)
+            
+            # Покрывающий индекс для постраничного списка шаблонов (после ALTER: нужен word_count)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS templates_user_created_idx
+                ON templates (user_id, created_at DESC, id DESC) INCLUDE (name, length, word_count)
+            """)
+            
+            # Таблица FSM-состояний (см. storage.PostgresStorage)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS fsm_storage (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data JSONB NOT NULL DEFAULT '{}',
+                    updated_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
     
     async def get_or_create_user(self, telegram_id: int, username: str = None, 
-                                 first_name: str = None, last_name: str = None):
-        async with self.pool.acquire() as conn:
-            user = await conn.fetchrow(
-                "SELECT * FROM users WHERE telegram_id = $1",
-                telegram_id
-            )
-            if not user:
+                                 first_name: str = None, last_name: str = None) -> Dict:
+        now = time.monotonic()
+        cached = self.user_cache.get(telegram_id)
+        if cached is not None:
+            user, touched_at = cached
+            username_changed = username is not None and username != user.get('username')
+            if not username_changed and now - touched_at < config.LAST_ACTIVE_INTERVAL:
+                return user
+            
+            # last_active пишется отложенно и не чаще раза в LAST_ACTIVE_INTERVAL
+            self._buffer_put(self._activity_buffer, telegram_id, (username, time.time()))
+            user['username'] = username
+            self.user_cache.set(telegram_id, (user, now))
+            return user
+        
+        with DB_QUERY_SECONDS.time("get_or_create_user"):
+            async with self.acquire() as conn:
                 user = await conn.fetchrow(
                     """
                     INSERT INTO users (telegram_id, username, first_name, last_name)
                     VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (telegram_id) DO UPDATE SET
+                        last_active = NOW(),
+                        username = EXCLUDED.username
                     RETURNING *
                     """,
                     telegram_id, username, first_name, last_name
                 )
-            else:
-                await conn.execute(
-                    "UPDATE users SET last_active = NOW(), username = $2 WHERE telegram_id = $1",
-                    telegram_id, username
+        user = dict(user)
+        self._activity_buffer.pop(telegram_id, None)
+        self.user_cache.set(telegram_id, (user, now))
+        return user
+    
+    @timed(DB_QUERY_SECONDS)
+    async def delete_user(self, telegram_id: int) -> bool:
+        """Удаление пользователя (шаблоны и параметры удаляются каскадно)"""
+        cached = self.user_cache.pop(telegram_id)
+        if cached is not None:
+            self._last_params_buffer.pop(cached[0]['id'], None)
+            self.template_cache.pop(cached[0]['id'])
+        self._activity_buffer.pop(telegram_id, None)
+        async with self.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM users WHERE telegram_id = $1",
+                telegram_id
+            )
+        # Сбрасываем повторно: запись могла попасть в кэш, пока шёл DELETE
+        self.user_cache.pop(telegram_id)
+        return result.endswith("1")
+    
+    async def _cached_templates(self, user_id: int) -> Optional[CachedTemplates]:
+        """Все шаблоны пользователя из кэша; при промахе — один запрос. None — шаблонов слишком много"""
+        cached = self.template_cache.get(user_id)
+        if cached is not None:
+            return None if cached is _TOO_MANY_TEMPLATES else cached
+        with DB_QUERY_SECONDS.time("_cached_templates"):
+            async with self.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT * FROM templates WHERE user_id = $1
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT $2
+                    """,
+                    user_id, config.TEMPLATE_CACHE_MAX_ITEMS + 1
                 )
-            return user
+        if len(rows) > config.TEMPLATE_CACHE_MAX_ITEMS:
+            self.template_cache.set(user_id, _TOO_MANY_TEMPLATES)
+            return None
+        cached = CachedTemplates.build([dict(row) for row in rows])
+        self.template_cache.set(user_id, cached)
+        return cached
     
+    @timed(DB_QUERY_SECONDS)
     async def save_template(self, user_id: int, name: str, params: Dict[str, Any]) -> int:
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             template = await conn.fetchrow(
                 """
                 INSERT INTO templates 
                 (user_id, name, length, include_digits, include_lowercase, 
                  include_uppercase, include_special, exclude_similar, 
-                 require_all_types, no_repeats)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-                RETURNING id
+                 require_all_types, no_repeats,
+                 mode, word_count, separator, capitalize, add_digit)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
+                RETURNING *
                 """,
-                user_id, name,
-                params['length'],
-                params.get('include_digits', False),
-                params.get('include_lowercase', False),
-                params.get('include_uppercase', False),
-                params.get('include_special', False),
-                params.get('exclude_similar', False),
-                params.get('require_all_types', False),
-                params.get('no_repeats', False)
+                user_id, name, *self._params_values(params)
             )
-            return template['id']
+        # Write-through: добавляем шаблон в кэш, если список пользователя уже загружен
+        cached = self.template_cache.get(user_id)
+        if cached is not None and cached is not _TOO_MANY_TEMPLATES:
+            if len(cached.items) < config.TEMPLATE_CACHE_MAX_ITEMS:
+                self.template_cache.set(user_id, CachedTemplates.build(cached.items + [dict(template)]))
+            else:
+                self.template_cache.set(user_id, _TOO_MANY_TEMPLATES)
+        return template['id']
     
     async def get_user_templates(self, user_id: int) -> List[Dict]:
-        async with self.pool.acquire() as conn:
-            templates = await conn.fetch(
-                "SELECT * FROM templates WHERE user_id = $1 ORDER BY created_at DESC",
-                user_id
-            )
-            return [dict(t) for t in templates]
+        cached = await self._cached_templates(user_id)
+        if cached is not None:
+            return list(cached.items)
+        with DB_QUERY_SECONDS.time("get_user_templates"):
+            async with self.acquire() as conn:
+                templates = await conn.fetch(
+                    "SELECT * FROM templates WHERE user_id = $1 ORDER BY created_at DESC",
+                    user_id
+                )
+        return [dict(t) for t in templates]
+    
+    async def get_templates_page(self, user_id: int, cursor: Optional[Tuple[datetime, int]] = None,
+                                 backward: bool = False, limit: int = config.TEMPLATES_PAGE_SIZE) -> TemplatePage:
+        """Keyset-пагинация по (created_at DESC, id DESC): страница после cursor или перед ним (backward)"""
+        cached = await self._cached_templates(user_id)
+        if cached is not None:
+            return self._page_from_cache(cached, cursor, backward, limit)
+        
+        with DB_QUERY_SECONDS.time("get_templates_page"):
+            async with self.acquire() as conn:
+                if cursor is None:
+                    rows = await conn.fetch(
+                        """
+                        SELECT id, name, length, word_count, created_at FROM templates
+                        WHERE user_id = $1
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT $2
+                        """,
+                        user_id, limit + 1
+                    )
+                elif not backward:
+                    rows = await conn.fetch(
+                        """
+                        SELECT id, name, length, word_count, created_at FROM templates
+                        WHERE user_id = $1 AND (created_at, id) < ($2::timestamp, $3::int)
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT $4
+                        """,
+                        user_id, cursor[0], cursor[1], limit + 1
+                    )
+                else:
+                    rows = await conn.fetch(
+                        """
+                        SELECT id, name, length, word_count, created_at FROM templates
+                        WHERE user_id = $1 AND (created_at, id) > ($2::timestamp, $3::int)
+                        ORDER BY created_at ASC, id ASC
+                        LIMIT $4
+                        """,
+                        user_id, cursor[0], cursor[1], limit + 1
+                    )
+        
+        items = [dict(row) for row in rows[:limit]]
+        has_more = len(rows) > limit
+        if backward:
+            items.reverse()
+            return TemplatePage(items, has_prev=has_more, has_next=True)
+        return TemplatePage(items, has_prev=cursor is not None, has_next=has_more)
+    
+    @staticmethod
+    def _page_from_cache(cached: CachedTemplates, cursor: Optional[Tuple[datetime, int]],
+                         backward: bool, limit: int) -> TemplatePage:
+        items = cached.items
+        if cursor is None:
+            return TemplatePage(items[:limit], has_prev=False, has_next=len(items) > limit)
+        # Первая позиция, ключ которой не больше cursor (список отсортирован по убыванию)
+        split = next((i for i, t in enumerate(items) if _template_key(t) <= cursor), len(items))
+        if backward:
+            start = max(0, split - limit)
+            return TemplatePage(items[start:split], has_prev=start > 0, has_next=True)
+        if split < len(items) and _template_key(items[split]) == cursor:
+            split += 1
+        return TemplatePage(items[split:split + limit], has_prev=True, has_next=len(items) > split + limit)
     
     async def get_template(self, template_id: int, user_id: int) -> Optional[Dict]:
-        async with self.pool.acquire() as conn:
-            template = await conn.fetchrow(
-                "SELECT * FROM templates WHERE id = $1 AND user_id = $2",
-                template_id, user_id
-            )
+        cached = await self._cached_templates(user_id)
+        if cached is not None:
+            template = cached.by_id.get(template_id)
             return dict(template) if template else None
+        with DB_QUERY_SECONDS.time("get_template"):
+            async with self.acquire() as conn:
+                template = await conn.fetchrow(
+                    "SELECT * FROM templates WHERE id = $1 AND user_id = $2",
+                    template_id, user_id
+                )
+        return dict(template) if template else None
     
+    @timed(DB_QUERY_SECONDS)
     async def delete_template(self, template_id: int, user_id: int) -> bool:
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             result = await conn.execute(
                 "DELETE FROM templates WHERE id = $1 AND user_id = $2",
                 template_id, user_id
             )
-            return result.endswith("1")
+        cached = self.template_cache.get(user_id)
+        if cached is _TOO_MANY_TEMPLATES:
+            # После удаления список может поместиться в кэш — перечитаем при следующем обращении
+            self.template_cache.pop(user_id)
+        elif cached is not None and template_id in cached.by_id:
+            self.template_cache.set(
+                user_id, CachedTemplates.build([t for t in cached.items if t['id'] != template_id])
+            )
+        return result.endswith("1")
+    
+    # === Запросы по telegram_id: пользователь находится в том же запросе (JOIN), ===
+    # === без отдельного get_or_create_user. last_active при этом не обновляется. ===
+    
+    def _cached_user_id(self, telegram_id: int) -> Optional[int]:
+        cached = self.user_cache.get(telegram_id)
+        return cached[0]['id'] if cached is not None else None
+    
+    async def get_template_for_telegram_user(self, template_id: int, telegram_id: int) -> Optional[Dict]:
+        user_id = self._cached_user_id(telegram_id)
+        if user_id is not None:
+            return await self.get_template(template_id, user_id)
+        # Время мерится только для запросов в БД, попадания в кэш не учитываются
+        with DB_QUERY_SECONDS.time("get_template_for_telegram_user"):
+            async with self.acquire() as conn:
+                template = await conn.fetchrow(
+                    """
+                    SELECT t.* FROM templates t
+                    JOIN users u ON u.id = t.user_id
+                    WHERE t.id = $1 AND u.telegram_id = $2
+                    """,
+                    template_id, telegram_id
+                )
+        return dict(template) if template else None
+    
+    async def delete_template_for_telegram_user(self, template_id: int, telegram_id: int) -> bool:
+        user_id = self._cached_user_id(telegram_id)
+        if user_id is not None:
+            return await self.delete_template(template_id, user_id)
+        with DB_QUERY_SECONDS.time("delete_template_for_telegram_user"):
+            async with self.acquire() as conn:
+                user_id = await conn.fetchval(
+                    """
+                    DELETE FROM templates t USING users u
+                    WHERE t.id = $1 AND t.user_id = u.id AND u.telegram_id = $2
+                    RETURNING t.user_id
+                    """,
+                    template_id, telegram_id
+                )
+        if user_id is None:
+            return False
+        # Список шаблонов пользователя мог быть в кэше — перечитаем при следующем обращении
+        self.template_cache.pop(user_id)
+        return True
+    
+    async def get_last_params_for_telegram_user(self, telegram_id: int) -> Optional[Dict]:
+        user_id = self._cached_user_id(telegram_id)
+        if user_id is not None:
+            return await self.get_last_params(user_id)
+        with DB_QUERY_SECONDS.time("get_last_params_for_telegram_user"):
+            async with self.acquire() as conn:
+                row = await conn.fetchrow(
+                    """
+                    SELECT u.id AS uid, lp.* FROM users u
+                    LEFT JOIN last_params lp ON lp.user_id = u.id
+                    WHERE u.telegram_id = $1
+                    """,
+                    telegram_id
+                )
+        if row is None:
+            return None
+        # Несохранённые параметры из буфера свежее, чем строка в БД
+        pending = self._last_params_buffer.get(row['uid']) or self._inflight.get('_last_params_buffer', {}).get(row['uid'])
+        if pending is not None:
+            return {'user_id': row['uid'], **pending}
+        if row['user_id'] is None:
+            return None
+        params = dict(row)
+        del params['uid']
+        return params
     
     async def save_last_params(self, user_id: int, params: Dict[str, Any]):
-        async with self.pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO last_params 
-                (user_id, length, include_digits, include_lowercase, 
-                 include_uppercase, include_special, exclude_similar, 
-                 require_all_types, no_repeats)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                ON CONFLICT (user_id) DO UPDATE SET
-                    length = EXCLUDED.length,
-                    include_digits = EXCLUDED.include_digits,
-                    include_lowercase = EXCLUDED.include_lowercase,
-                    include_uppercase = EXCLUDED.include_uppercase,
-                    include_special = EXCLUDED.include_special,
-                    exclude_similar = EXCLUDED.exclude_similar,
-                    require_all_types = EXCLUDED.require_all_types,
-                    no_repeats = EXCLUDED.no_repeats,
-                    updated_at = NOW()
-                """,
-                user_id,
-                params['length'],
-                params.get('include_digits', False),
-                params.get('include_lowercase', False),
-                params.get('include_uppercase', False),
-                params.get('include_special', False),
-                params.get('exclude_similar', False),
-                params.get('require_all_types', False),
-                params.get('no_repeats', False)
-            )
+        """Отложенное сохранение: в БД попадёт только последняя версия при сбросе буфера"""
+        values = self._params_values(params)
+        self._buffer_put(self._last_params_buffer, user_id, dict(zip(PARAM_COLUMNS, values)))
     
     async def get_last_params(self, user_id: int) -> Optional[Dict]:
-        async with self.pool.acquire() as conn:
-            params = await conn.fetchrow(
-                "SELECT * FROM last_params WHERE user_id = $1",
-                user_id
-            )
-            return dict(params) if params else None
+        pending = self._last_params_buffer.get(user_id)
+        if pending is None:
+            pending = self._inflight.get('_last_params_buffer', {}).get(user_id)
+        if pending is not None:
+            return {'user_id': user_id, **pending}
+        with DB_QUERY_SECONDS.time("get_last_params"):
+            async with self.acquire() as conn:
+                params = await conn.fetchrow(
+                    "SELECT * FROM last_params WHERE user_id = $1",
+                    user_id
+                )
+        return dict(params) if params else None
 
 db = Database()
+
+# Датчики пула и кэша пользователей для /metrics (считаются при запросе)
+GaugeFunc("bot_db_pool_size", "Open pool connections", lambda: db.pool.get_size() if db.pool else 0)
+GaugeFunc("bot_db_pool_in_use", "Pool connections in use", lambda: db.pool_stats.in_use)
+GaugeFunc("bot_db_pool_acquire_timeouts_total", "Pool acquire timeouts", lambda: db.pool_stats.timeouts, "counter")
+GaugeFunc("bot_user_cache_hits_total", "User cache hits", lambda: db.user_cache.hits, "counter")
+GaugeFunc("bot_user_cache_misses_total", "User cache misses", lambda: db.user_cache.misses, "counter")
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from cache import TTLCache
+from config import config
+from metrics import KEYBOARD_EDITS
+
+Key = Tuple[int, int]  # (chat_id, message_id)
+
+
+class PendingEdit:
+    __slots__ = ('bot', 'markup', 'shown', 'task')
+
+    def __init__(self, bot: Bot, markup: InlineKeyboardMarkup, shown: Optional[InlineKeyboardMarkup]):
+        self.bot = bot
+        self.markup = markup
+        self.shown = shown          # клавиатура из апдейта, если отправленной ещё нет
+        self.task: Optional[asyncio.Task] = None
+
+
+class EditCoalescer:
+    """Отложенная замена клавиатуры сообщения: из серии быстрых нажатий
+    в Bot API уходит только последняя клавиатура окна, а если она совпадает
+    с уже показанной — ничего."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._pending: Dict[Key, PendingEdit] = {}
+        self._sending: Dict[Key, asyncio.Task] = {}
+        # Последняя отправленная клавиатура сообщения (в апдейтах она может быть устаревшей)
+        self._shown = TTLCache(10000, 600)
+
+    async def edit_markup(self, message: Message, markup: InlineKeyboardMarkup):
+        key = (message.chat.id, message.message_id)
+        KEYBOARD_EDITS.inc("requested")
+        edit = self._pending.get(key)
+        if edit is not None:
+            # Окно уже открыто: уйдёт только последняя клавиатура
+            edit.markup = markup
+            KEYBOARD_EDITS.inc("coalesced")
+            return
+
+        shown = self._shown.get(key) or message.reply_markup
+        edit = PendingEdit(message.bot, markup, shown)
+        if self.delay <= 0:
+            await self._send(key, edit)
+            return
+        self._pending[key] = edit
+        edit.task = asyncio.create_task(self._send_later(key, edit))
+
+    async def _send_later(self, key: Key, edit: PendingEdit):
+        await asyncio.sleep(self.delay)
+        if self._pending.get(key) is not edit:
+            return
+        sending = self._sending.get(key)
+        if sending is not None:
+            # Предыдущая клавиатура ещё отправляется: новая сравнивается с ней, а не с апдейтом
+            await asyncio.shield(sending)
+            if self._pending.get(key) is not edit:
+                return
+        del self._pending[key]
+        self._sending[key] = asyncio.current_task()
+        try:
+            await self._send(key, edit)
+        finally:
+            if self._sending.get(key) is asyncio.current_task():
+                del self._sending[key]
+
+    async def _send(self, key: Key, edit: PendingEdit):
+        if edit.markup == (self._shown.get(key) or edit.shown):
+            KEYBOARD_EDITS.inc("unchanged")
+            return
+        chat_id, message_id = key
+        try:
+            await edit.bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=edit.markup)
+            self._shown.set(key, edit.markup)
+            KEYBOARD_EDITS.inc("sent")
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                self._shown.set(key, edit.markup)
+                KEYBOARD_EDITS.inc("unchanged")
+            else:
+                KEYBOARD_EDITS.inc("failed")
+                logging.warning(f"⚠️ Не удалось обновить клавиатуру: {e}")
+        except Exception as e:
+            KEYBOARD_EDITS.inc("failed")
+            logging.warning(f"⚠️ Не удалось обновить клавиатуру: {e}")
+
+    async def flush(self, chat_id: int, message_id: int):
+        """Отправить отложенную клавиатуру сообщения сейчас и дождаться отправки.
+
+        Вызывается перед любым другим обработчиком этого сообщения, чтобы
+        запоздавшая клавиатура не перезаписала новый экран. После этого
+        сообщение может измениться, поэтому запомненная клавиатура сбрасывается.
+        """
+        key = (chat_id, message_id)
+        sending = self._sending.get(key)
+        if sending is not None:
+            await asyncio.shield(sending)
+        edit = self._pending.pop(key, None)
+        if edit is not None:
+            edit.task.cancel()
+            await self._send(key, edit)
+        self._shown.pop(key)
+
+    async def close(self):
+        for chat_id, message_id in list(self._pending):
+            await self.flush(chat_id, message_id)
+        if self._sending:
+            await asyncio.gather(*self._sending.values(), return_exceptions=True)
+
+
+edit_coalescer = EditCoalescer(config.EDIT_DEBOUNCE)
@@ -0,0 +1,140 @@
+import os
+from functools import lru_cache
+from typing import Any, List, MutableSequence, Sequence
+
+# Размер одного пополнения буфера из os.urandom
+DEFAULT_CHUNK_SIZE = 4096
+
+
+# _LIMITS[n]: байты >= limit отбрасываются, чтобы b % n было равномерным
+_LIMITS = [0] + [256 - 256 % n for n in range(1, 257)]
+
+
+@lru_cache(maxsize=None)
+def _translate_tables(n: int):
+    """Таблица bytes.translate: байт -> байт % n, байты >= limit отбрасываются"""
+    limit = _LIMITS[n]
+    table = bytes(b % n for b in range(limit)) + bytes(256 - limit)
+    return limit, table, bytes(range(limit, 256))
+
+
+class EntropyPool:
+    """Буферизованный CSPRNG: os.urandom читается крупными блоками"""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._buf = b''
+        self._pos = 0
+        self.bytes_consumed = 0
+        self.refills = 0
+        # После fork дочерний процесс не должен повторять байты родителя
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._buf = b''
+        self._pos = 0
+
+    def _refill(self):
+        self._buf = os.urandom(self.chunk_size)
+        self._pos = 0
+        self.refills += 1
+
+    def bytes(self, n: int) -> bytes:
+        """n случайных байт"""
+        self.bytes_consumed += n
+        if n > self.chunk_size:
+            self.refills += 1
+            return os.urandom(n)
+
+        if self._pos + n > len(self._buf):
+            self._refill()
+        start = self._pos
+        self._pos += n
+        return self._buf[start:self._pos]
+
+    def randbelow(self, n: int) -> int:
+        """Равномерное целое из [0, n) без смещения по модулю"""
+        if n <= 0:
+            raise ValueError("n должно быть положительным")
+        if n <= 256:
+            # Быстрый путь: один байт из буфера, отбраковка хвоста >= limit
+            limit = _LIMITS[n]
+            while True:
+                if self._pos >= len(self._buf):
+                    self._refill()
+                b = self._buf[self._pos]
+                self._pos += 1
+                self.bytes_consumed += 1
+                if b < limit:
+                    return b % n
+        bits = (n - 1).bit_length()
+        nbytes = (bits + 7) // 8
+        mask = (1 << bits) - 1
+        while True:
+            value = int.from_bytes(self.bytes(nbytes), 'big') & mask
+            if value < n:
+                return value
+
+    def randbelow_many(self, n: int, k: int) -> bytes:
+        """k равномерных значений из [0, n) для n <= 256, по одному байту на значение"""
+        if not 0 < n <= 256:
+            raise ValueError("n должно быть в диапазоне 1..256")
+        limit, table, rejected = _translate_tables(n)
+        result = b''
+        while len(result) < k:
+            # Отбраковка и взятие по модулю выполняются в bytes.translate на уровне C
+            result += self.bytes((k - len(result)) * 256 // limit + 8).translate(table, rejected)
+        return result[:k]
+
+    def choice(self, seq: Sequence[Any]) -> Any:
+        if not seq:
+            raise IndexError("Пустая последовательность")
+        return seq[self.randbelow(len(seq))]
+
+    def choices(self, population: Sequence[Any], k: int) -> List[Any]:
+        """k элементов с возвращением"""
+        if len(population) <= 256:
+            return [population[i] for i in self.randbelow_many(len(population), k)]
+        return [population[self.randbelow(len(population))] for _ in range(k)]
+
+    def _fisher_yates(self, items: MutableSequence[Any], k: int):
+        """Первые k позиций items становятся случайной выборкой без повторов"""
+        n = len(items)
+        if n > 256:
+            for i in range(k):
+                j = i + self.randbelow(n - i)
+                items[i], items[j] = items[j], items[i]
+            return
+        
+        # Для коротких последовательностей — байтовая отбраковка без вызова randbelow на шаг
+        buf = self.bytes(2 * k)
+        pos = 0
+        for i in range(k):
+            m = n - i
+            limit = _LIMITS[m]
+            while True:
+                if pos >= len(buf):
+                    buf = self.bytes(k)
+                    pos = 0
+                b = buf[pos]
+                pos += 1
+                if b < limit:
+                    break
+            j = i + b % m
+            items[i], items[j] = items[j], items[i]
+
+    def sample(self, population: Sequence[Any], k: int) -> List[Any]:
+        """k различных элементов (частичная перетасовка Фишера–Йетса)"""
+        items = list(population)
+        if not 0 <= k <= len(items):
+            raise ValueError("Размер выборки больше размера совокупности")
+        self._fisher_yates(items, k)
+        return items[:k]
+
+    def shuffle(self, items: MutableSequence[Any]):
+        """Перетасовка на месте (Фишер–Йетс)"""
+        if len(items) > 1:
+            self._fisher_yates(items, len(items) - 1)
+
+
+entropy_pool = EntropyPool()
@@ -0,0 +1,313 @@
+import math
+from functools import lru_cache
+from itertools import combinations as subsets
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from config import config
+from entropy import entropy_pool
+from metrics import PASSWORDS_GENERATED
+from wordlist import Wordlist, wordlist
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: есть реализация на чистом Python
+    np = None
+
+# Максимум паролей, генерируемых за один проход (ограничивает память под no_repeats)
+BATCH_CHUNK = 8192
+
+# Биты маски параметров: 4 типа символов + exclude_similar определяют алфавит
+# (32 комбинации, CHAR_MASK), require_all_types и no_repeats — только оценку надёжности
+MASK_FLAGS = (
+    ('include_digits', 1),
+    ('include_lowercase', 2),
+    ('include_uppercase', 4),
+    ('include_special', 8),
+    ('exclude_similar', 16),
+    ('require_all_types', 32),
+    ('no_repeats', 64),
+)
+CHAR_MASK = 31
+CHAR_GROUPS = (config.DIGITS, config.LOWERCASE, config.UPPERCASE, config.SPECIAL)
+
+
+class CharTable(NamedTuple):
+    """Предвычисленные данные для одной комбинации флагов"""
+    alphabet: str
+    groups: Tuple[str, ...]               # непустые группы после исключения похожих символов
+    group_sets: Tuple[frozenset, ...]
+    codes: bytes                          # alphabet в ASCII (для NumPy и bytes.translate)
+    translate_table: bytes                # индекс -> код символа, для bytes.translate
+    group_of: bytes                       # номер группы для каждой позиции алфавита
+
+
+def params_mask(params: Dict[str, Any]) -> int:
+    mask = 0
+    for key, bit in MASK_FLAGS:
+        if params.get(key):
+            mask |= bit
+    return mask
+
+
+def _build_table(mask: int) -> CharTable:
+    groups = [group for i, group in enumerate(CHAR_GROUPS) if mask & (1 << i)]
+    if mask & 16:
+        groups = [''.join(c for c in group if c not in config.SIMILAR_CHARS) for group in groups]
+    groups = tuple(group for group in groups if group)
+    alphabet = ''.join(groups)
+    codes = alphabet.encode('ascii')
+    return CharTable(
+        alphabet=alphabet,
+        groups=groups,
+        group_sets=tuple(frozenset(group) for group in groups),
+        codes=codes,
+        translate_table=codes.ljust(256, b'\0'),
+        group_of=bytes(g for g, group in enumerate(groups) for _ in group),
+    )
+
+
+# Таблица строится один раз при импорте; индекс — маска параметров
+CHAR_TABLES: Tuple[CharTable, ...] = tuple(_build_table(mask) for mask in range(CHAR_MASK + 1))
+
+
+class SecurityEstimate(NamedTuple):
+    bits: float                  # log2 числа возможных паролей
+    combinations: float
+    combinations_text: str       # как показывается пользователю в "Комбинации"
+    level: str
+    security_name: str           # "Надёжность"
+    time_estimate: str
+
+
+# Пороги уровней надёжности в битах: 10^6, 10^12, 10^18, 10^24 комбинаций
+_LEVEL_BITS = (
+    (6 * math.log2(10), "very_low"),
+    (12 * math.log2(10), "low"),
+    (18 * math.log2(10), "medium"),
+    (24 * math.log2(10), "high"),
+)
+
+
+def _log2_count(size: int, length: int, no_repeats: bool) -> float:
+    """log2 числа строк длины length над алфавитом size (-inf, если их нет)"""
+    if no_repeats:
+        if size < length:
+            return -math.inf
+        return (math.lgamma(size + 1) - math.lgamma(size - length + 1)) / math.log(2)
+    if size == 0:
+        return -math.inf if length else 0.0
+    return length * math.log2(size)
+
+
+@lru_cache(maxsize=None)
+def _estimate(mask: int, length: int) -> SecurityEstimate:
+    table = CHAR_TABLES[mask & CHAR_MASK]
+    size = len(table.alphabet)
+    no_repeats = bool(mask & 64)
+    bits = _log2_count(size, length, no_repeats)
+    
+    if mask & 32 and len(table.groups) > 1 and bits > -math.inf:
+        # Доля строк, содержащих все группы (формула включений-исключений),
+        # считается как сумма отношений к общему числу — без больших целых
+        share = 0.0
+        sizes = [len(group) for group in table.groups]
+        for k in range(len(sizes) + 1):
+            for excluded in subsets(sizes, k):
+                term_bits = _log2_count(size - sum(excluded), length, no_repeats)
+                if term_bits > -math.inf:
+                    share += (-1) ** k * 2 ** (term_bits - bits)
+        bits = bits + math.log2(share) if share > 0 else -math.inf
+    
+    return _security_estimate(bits)
+
+
+# Пороги записи "×10²⁴" и "×10⁶" в битах: 2 ** bits на самой границе (24 или 6 цифр)
+# получается чуть меньше 10**24 / 10**6, поэтому ветка выбирается по bits с допуском
+_E24_BITS = 24 * math.log2(10) - 1e-9
+_E6_BITS = 6 * math.log2(10) - 1e-9
+
+
+def _security_estimate(bits: float) -> SecurityEstimate:
+    combinations = 2 ** bits if bits > -math.inf else 0.0
+    if bits >= _E24_BITS: combinations_text = f"{combinations / 10**24:.1f}×10²⁴"
+    elif bits >= _E6_BITS: combinations_text = f"{combinations / 10**6:.1f}×10⁶"
+    else: combinations_text = f"{round(combinations):,}"
+    
+    level = "very_high"
+    for threshold, name in _LEVEL_BITS:
+        if bits < threshold:
+            level = name
+            break
+    
+    security_name, time_estimate = config.SECURITY_LEVELS[level]
+    return SecurityEstimate(bits, combinations, combinations_text, level, security_name, time_estimate)
+
+
+@lru_cache(maxsize=None)
+def _passphrase_estimate(word_count: int, add_digit: bool, words: int) -> SecurityEstimate:
+    # Регистр и разделитель фиксированы параметрами и энтропии не добавляют;
+    # цифра — одна из 10, приписанная к одному из word_count слов
+    bits = word_count * math.log2(words)
+    if add_digit:
+        bits += math.log2(10 * word_count)
+    return _security_estimate(bits)
+
+
+# Оценки для всех масок и всех допустимых длин считаются заранее
+for _mask in range(128):
+    for _length in range(config.MIN_LENGTH, config.MAX_LENGTH + 1):
+        _estimate(_mask, _length)
+
+
+class PasswordGenerator:
+    """Генератор паролей"""
+    
+    @staticmethod
+    def get_alphabet(params: Dict[str, Any]) -> str:
+        """Получить алфавит на основе параметров"""
+        return CHAR_TABLES[params_mask(params) & CHAR_MASK].alphabet
+    
+    @staticmethod
+    def generate_password(params: Dict[str, Any]) -> str:
+        """Оптимизированная генерация пароля"""
+        if params.get('mode') == 'passphrase':
+            return PasswordGenerator.generate_passphrase(params)
+        length = params['length']
+        table = CHAR_TABLES[params_mask(params) & CHAR_MASK]
+        alphabet = table.alphabet
+        no_repeats = params.get('no_repeats')
+        
+        if not alphabet:
+            raise ValueError("Алфавит пустой. Выберите хотя бы один тип символов.")
+        
+        if no_repeats and len(alphabet) < length:
+            raise ValueError(f"Невозможно сгенерировать пароль без повторов: "
+                           f"алфавит ({len(alphabet)}) меньше длины ({length})")
+        
+        # Если обязательно нужны все типы — по одному символу из каждой группы
+        required_chars = [entropy_pool.choice(group) for group in table.groups] if params.get('require_all_types') else []
+        
+        # Дозаполняем остаток
+        remaining_length = length - len(required_chars)
+        
+        if remaining_length <= 0:
+            password_chars = []
+        elif not no_repeats:
+            password_chars = entropy_pool.choices(alphabet, k=remaining_length)
+        elif required_chars:
+            # Выборка с запасом на уже взятые символы: после их удаления остаётся
+            # равномерная выборка без повторов из оставшейся части алфавита
+            extra = entropy_pool.sample(alphabet, min(len(alphabet), remaining_length + len(required_chars)))
+            password_chars = [c for c in extra if c not in required_chars][:remaining_length]
+        else:
+            password_chars = entropy_pool.sample(alphabet, remaining_length)
+        
+        # Остаток уже случайно упорядочен, поэтому вместо полной перетасовки
+        # достаточно вставить обязательные символы на случайные позиции
+        for char in required_chars:
+            password_chars.insert(entropy_pool.randbelow(len(password_chars) + 1), char)
+        PASSWORDS_GENERATED.inc()
+        return ''.join(password_chars)
+    
+    @staticmethod
+    def generate_passphrase(params: Dict[str, Any], words: Optional[Wordlist] = None) -> str:
+        """Парольная фраза: word_count случайных слов словаря (O(1) на слово)"""
+        words = wordlist if words is None else words
+        if not words.available:
+            raise ValueError("Словарь для парольных фраз не установлен")
+        
+        count = len(words)
+        phrase = [words[entropy_pool.randbelow(count)] for _ in range(params['word_count'])]
+        if params.get('capitalize'):
+            phrase = [word[:1].upper() + word[1:] for word in phrase]
+        if params.get('add_digit'):
+            phrase[entropy_pool.randbelow(len(phrase))] += str(entropy_pool.randbelow(10))
+        PASSWORDS_GENERATED.inc()
+        return params.get('separator', '-').join(phrase)
+    
+    @staticmethod
+    def generate_batch(params: Dict[str, Any], n: int) -> List[str]:
+        """
+        Массовая генерация n паролей.
+        
+        Случайность берётся крупными блоками из entropy_pool, байты переводятся
+        в индексы алфавита отбраковкой (без смещения по модулю). Пароли без
+        require_all_types/no_repeats равномерны по всему алфавиту, с
+        require_all_types — равномерны среди паролей, содержащих все группы.
+        """
+        length = params['length']
+        table = CHAR_TABLES[params_mask(params) & CHAR_MASK]
+        no_repeats = bool(params.get('no_repeats'))
+        
+        if not table.alphabet:
+            raise ValueError("Алфавит пустой. Выберите хотя бы один тип символов.")
+        
+        if no_repeats and len(table.alphabet) < length:
+            raise ValueError(f"Невозможно сгенерировать пароль без повторов: "
+                           f"алфавит ({len(table.alphabet)}) меньше длины ({length})")
+        
+        check_groups = bool(params.get('require_all_types')) and len(table.groups) > 1
+        if check_groups and len(table.groups) > length:
+            raise ValueError(f"Длина ({length}) меньше числа обязательных типов ({len(table.groups)})")
+        
+        draw = _batch_numpy if np is not None else _batch_python
+        passwords: List[str] = []
+        accept_rate = 1.0
+        while len(passwords) < n:
+            need = n - len(passwords)
+            # С запасом на отбраковку паролей, в которых не хватает групп
+            count = min(BATCH_CHUNK, int(need / accept_rate * 1.1) + 1)
+            batch = draw(table, check_groups, length, count, no_repeats)
+            accept_rate = max(len(batch) / count, 0.01)
+            passwords.extend(batch[:need])
+        PASSWORDS_GENERATED.inc(amount=n)
+        return passwords
+    
+    @staticmethod
+    def estimate_security(params: Dict[str, Any]) -> SecurityEstimate:
+        """Оценка надёжности в битах (с учётом require_all_types и no_repeats)"""
+        if params.get('mode') == 'passphrase':
+            return _passphrase_estimate(params['word_count'], bool(params.get('add_digit')), len(wordlist))
+        return _estimate(params_mask(params), params['length'])
+    
+    @staticmethod
+    def calculate_security(params: Dict[str, Any]) -> Tuple[str, str, float]:
+        """Рассчитать безопасность пароля"""
+        estimate = PasswordGenerator.estimate_security(params)
+        return estimate.security_name, estimate.time_estimate, estimate.combinations
+
+def _batch_numpy(table: CharTable, check_groups: bool, length: int, count: int, no_repeats: bool) -> List[str]:
+    codes = np.frombuffer(table.codes, dtype=np.uint8)
+    size = len(codes)
+    
+    if no_repeats:
+        # Случайная перестановка алфавита для каждого пароля: argsort случайных ключей
+        keys = np.frombuffer(entropy_pool.bytes(count * size * 8), dtype=np.uint64).reshape(count, size)
+        idx = np.argsort(keys, axis=1)[:, :length]
+    else:
+        idx = np.frombuffer(entropy_pool.randbelow_many(size, count * length), dtype=np.uint8)
+        idx = idx.reshape(count, length)
+    
+    if check_groups:
+        membership = np.frombuffer(table.group_of, dtype=np.uint8)[idx]
+        ok = np.ones(len(idx), dtype=bool)
+        for g in range(len(table.groups)):
+            ok &= (membership == g).any(axis=1)
+        idx = idx[ok]
+    
+    blob = codes[idx].tobytes().decode('ascii')
+    return [blob[i:i + length] for i in range(0, len(blob), length)]
+
+
+def _batch_python(table: CharTable, check_groups: bool, length: int, count: int, no_repeats: bool) -> List[str]:
+    if no_repeats:
+        passwords = [''.join(entropy_pool.sample(table.alphabet, length)) for _ in range(count)]
+    else:
+        blob = entropy_pool.randbelow_many(len(table.alphabet), count * length).translate(
+            table.translate_table
+        ).decode('ascii')
+        passwords = [blob[i:i + length] for i in range(0, len(blob), length)]
+    
+    if check_groups:
+        passwords = [p for p in passwords if all(not g.isdisjoint(p) for g in table.group_sets)]
+    return passwords
@@ -0,0 +1,111 @@
+import itertools
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
+
+from config import config
+from generator import CHAR_MASK, CHAR_TABLES, MASK_FLAGS, PasswordGenerator
+
+# Буквы флагов в запросе "@bot 16 dlus"
+SPEC_LETTERS = {
+    'd': 'include_digits',
+    'l': 'include_lowercase',
+    'u': 'include_uppercase',
+    's': 'include_special',
+    'x': 'exclude_similar',
+    'r': 'require_all_types',
+    'n': 'no_repeats',
+}
+SPEC_HELP = "Формат: 16 dlus (длина, d/l/u/s — типы, x/r/n — опции)"
+
+_BITS = dict(MASK_FLAGS)
+_TOKEN = re.compile(r"(\d+)?([a-z]*)")
+# id результата уникален в пределах ответа и между ответами (клиент не подставит старый)
+_result_ids = itertools.count()
+
+
+class InlineSpec(NamedTuple):
+    """Заготовка ответа для одной пары (маска, длина): параметры и прототип статьи"""
+    params: Dict[str, object]
+    error: Optional[str]
+    article: Optional[InlineQueryResultArticle]
+
+
+def _mask_of(letters: str) -> int:
+    mask = 0
+    for letter in letters:
+        mask |= _BITS[SPEC_LETTERS[letter]]
+    return mask
+
+
+DEFAULT_MASK = _mask_of(config.INLINE_DEFAULT_FLAGS)
+
+
+@lru_cache(maxsize=config.INLINE_QUERY_CACHE_SIZE)
+def parse_query(query: str) -> Optional[Tuple[int, int]]:
+    """Запрос -> (маска, длина); None, если запрос не разобран.
+
+    Длина и флаги в любом порядке, слитно или через пробел: "16", "dlus 20", "12dlux".
+    Без флагов берутся INLINE_DEFAULT_FLAGS, без длины — INLINE_DEFAULT_LENGTH.
+    """
+    length, letters = None, ""
+    for token in query.lower().split():
+        match = _TOKEN.fullmatch(token)
+        if match is None or any(c not in SPEC_LETTERS for c in match[2]):
+            return None
+        if match[1]:
+            if length is not None:
+                return None
+            length = int(match[1])
+        letters += match[2]
+    mask = _mask_of(letters) if letters else DEFAULT_MASK
+    return mask, length if length is not None else config.INLINE_DEFAULT_LENGTH
+
+
+def get_spec(mask: int, length: int) -> InlineSpec:
+    if not config.MIN_LENGTH <= length <= config.MAX_LENGTH:
+        # Вне кэша: длина приходит из запроса и может быть любой
+        return InlineSpec({}, f"Длина от {config.MIN_LENGTH} до {config.MAX_LENGTH}", None)
+    return _build_spec(mask, length)
+
+
+@lru_cache(maxsize=None)
+def _build_spec(mask: int, length: int) -> InlineSpec:
+    params = {key: bool(mask & bit) for key, bit in MASK_FLAGS}
+    params['length'] = length
+
+    table = CHAR_TABLES[mask & CHAR_MASK]
+    error = None
+    if not table.alphabet:
+        error = "Выберите хотя бы один тип символов: d, l, u, s"
+    elif params['no_repeats'] and len(table.alphabet) < length:
+        error = f"Без повторов длина не больше {len(table.alphabet)}"
+    elif params['require_all_types'] and len(table.groups) > length:
+        error = f"Длина меньше числа обязательных типов ({len(table.groups)})"
+    if error is not None:
+        return InlineSpec(params, error, None)
+
+    estimate = PasswordGenerator.estimate_security(params)
+    # Прототип проходит валидацию один раз; в ответах — только копии с паролем
+    article = InlineQueryResultArticle(
+        id="0",
+        title="",
+        description=f"{length} символов · {estimate.security_name}",
+        input_message_content=InputTextMessageContent(message_text="", parse_mode="Markdown"),
+    )
+    return InlineSpec(params, None, article)
+
+
+def build_results(spec: InlineSpec, count: int) -> List[InlineQueryResultArticle]:
+    """count статей с новыми паролями на основе прототипа спецификации"""
+    content = spec.article.input_message_content
+    return [
+        spec.article.model_copy(update={
+            'id': str(next(_result_ids)),
+            'title': password,
+            'input_message_content': content.model_copy(update={'message_text': f"`{password}`"}),
+        })
+        for password in PasswordGenerator.generate_batch(spec.params, count)
+    ]
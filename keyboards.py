@@ -1,170 +1,287 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 
+from callbacks import Action, PageCursor, pack
+from config import config
+
+# Клавиатуры кэшируются, и один экземпляр отдаётся во все обработчики.
+# Модели aiogram не заморожены (InlineKeyboardMarkup — frozen=False), поэтому
+# возвращённую клавиатуру нельзя менять: нужна другая — model_copy() или новая.
+# Статические строятся один раз, переключаемые — по одной на каждую комбинацию флагов.
+
+CHAR_TYPES = [
+    ('digits', 'Цифры (0-9)'),
+    ('lowercase', 'Строчные буквы (a-z)'),
+    ('uppercase', 'Заглавные буквы (A-Z)'),
+    ('special', 'Спецсимволы (!@#$)'),
+]
+
+OPTIONS = [
+    ('exclude_similar', 'Исключить похожие символы (l/1, O/0)'),
+    ('require_all_types', 'Обязательно все выбранные типы'),
+    ('no_repeats', 'Без повторяющихся символов'),
+]
+
+SEPARATOR_LABELS = {'dash': '-', 'underscore': '_', 'dot': '.', 'space': '␣', 'none': 'нет'}
+
+PHRASE_OPTIONS = [
+    ('capitalize', 'С заглавной буквы (Слово-Слово)'),
+    ('add_digit', 'Добавить цифру'),
+]
+
+def _flags_mask(flags: Dict[str, bool], config_items: List[Tuple[str, str]]) -> int:
+    mask = 0
+    for i, (key, _) in enumerate(config_items):
+        if flags.get(key, False):
+            mask |= 1 << i
+    return mask
+
+@lru_cache(maxsize=None)
 def main_menu_kb() -> InlineKeyboardMarkup:
     """Главное меню"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🔄 Новый пароль", callback_data="new_password"),
-        InlineKeyboardButton(text="📁 Мои шаблоны", callback_data="my_templates")
+        InlineKeyboardButton(text="🔄 Новый пароль", callback_data=pack(Action.NEW_PASSWORD)),
+        InlineKeyboardButton(text="📁 Мои шаблоны", callback_data=pack(Action.MY_TEMPLATES))
     )
+    builder.row(InlineKeyboardButton(text="🔤 Парольная фраза", callback_data=pack(Action.NEW_PASSPHRASE)))
     builder.row(
-        InlineKeyboardButton(text="⚡ Последние параметры", callback_data="last_params"),
-        InlineKeyboardButton(text="ℹ️ Справка", callback_data="help")
+        InlineKeyboardButton(text="⚡ Последние параметры", callback_data=pack(Action.LAST_PARAMS)),
+        InlineKeyboardButton(text="ℹ️ Справка", callback_data=pack(Action.HELP))
     )
     return builder.as_markup()
 
+@lru_cache(maxsize=None)
 def length_kb() -> InlineKeyboardMarkup:
     """Выбор длины пароля"""
     builder = InlineKeyboardBuilder()
     buttons = [
-        InlineKeyboardButton(text="8", callback_data="length_8"),
-        InlineKeyboardButton(text="12", callback_data="length_12"),
-        InlineKeyboardButton(text="16", callback_data="length_16"),
-        InlineKeyboardButton(text="20", callback_data="length_20"),
-        InlineKeyboardButton(text="24", callback_data="length_24"),
-        InlineKeyboardButton(text="32", callback_data="length_32"),
+        InlineKeyboardButton(text="8", callback_data=pack(Action.LENGTH, 8)),
+        InlineKeyboardButton(text="12", callback_data=pack(Action.LENGTH, 12)),
+        InlineKeyboardButton(text="16", callback_data=pack(Action.LENGTH, 16)),
+        InlineKeyboardButton(text="20", callback_data=pack(Action.LENGTH, 20)),
+        InlineKeyboardButton(text="24", callback_data=pack(Action.LENGTH, 24)),
+        InlineKeyboardButton(text="32", callback_data=pack(Action.LENGTH, 32)),
     ]
     for i in range(0, len(buttons), 3):
         builder.row(*buttons[i:i+3])
-    builder.row(InlineKeyboardButton(text="✏️ Ввести вручную", callback_data="custom_length"))
-    builder.row(InlineKeyboardButton(text="↩️ Назад", callback_data="back_to_main"))
+    builder.row(InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=pack(Action.CUSTOM_LENGTH)))
+    builder.row(InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_MAIN)))
     return builder.as_markup()
 
 def char_types_kb(current_types: Dict[str, bool] = None) -> InlineKeyboardMarkup:
     """Выбор типов символов (Только статус + текст)"""
-    if current_types is None:
-        current_types = {
-            'digits': False,
-            'lowercase': False,
-            'uppercase': False,
-            'special': False
-        }
-    
+    return _char_types_kb(_flags_mask(current_types or {}, CHAR_TYPES))
+
+@lru_cache(maxsize=None)
+def _char_types_kb(mask: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
-    # Убрали все лишние иконки из кортежей
-    types_config = [
-        ('digits', 'Цифры (0-9)'),
-        ('lowercase', 'Строчные буквы (a-z)'),
-        ('uppercase', 'Заглавные буквы (A-Z)'),
-        ('special', 'Спецсимволы (!@#$)'),
-    ]
-    
-    for key, text in types_config:
+    for i, (key, text) in enumerate(CHAR_TYPES):
         # Логика простая: Если True -> ✅, Если False -> ❌
-        status = "✅" if current_types.get(key, False) else "❌"
+        status = "✅" if mask & (1 << i) else "❌"
         builder.row(InlineKeyboardButton(
             text=f"{status} {text}",
-            callback_data=f"toggle_{key}"
+            callback_data=pack(Action.TOGGLE_CHAR_TYPE, key)
         ))
     
     builder.row(
-        InlineKeyboardButton(text="➡️ Далее", callback_data="to_options"),
-        InlineKeyboardButton(text="↩️ Назад", callback_data="back_to_length")
+        InlineKeyboardButton(text="➡️ Далее", callback_data=pack(Action.TO_OPTIONS)),
+        InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_LENGTH))
     )
     
     return builder.as_markup()
 
 def options_kb(current_options: Dict[str, bool] = None) -> InlineKeyboardMarkup:
     """Дополнительные опции (Только статус + текст)"""
-    if current_options is None:
-        current_options = {
-            'exclude_similar': False,
-            'require_all_types': False,
-            'no_repeats': False
-        }
-    
+    return _options_kb(_flags_mask(current_options or {}, OPTIONS))
+
+@lru_cache(maxsize=None)
+def _options_kb(mask: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
-    # Полностью убрали иконки (👁️, ✅, 🔄) из названий
-    options_config = [
-        ('exclude_similar', 'Исключить похожие символы (l/1, O/0)'),
-        ('require_all_types', 'Обязательно все выбранные типы'),
-        ('no_repeats', 'Без повторяющихся символов'),
-    ]
-    
-    for key, text in options_config:
+    for i, (key, text) in enumerate(OPTIONS):
         # Логика простая: Если True -> ✅, Если False -> ❌
-        status = "✅" if current_options.get(key, False) else "❌"
+        status = "✅" if mask & (1 << i) else "❌"
         builder.row(InlineKeyboardButton(
             text=f"{status} {text}",
-            callback_data=f"option_{key}"
+            callback_data=pack(Action.TOGGLE_OPTION, key)
         ))
     
     builder.row(
-        InlineKeyboardButton(text="➡️ Предпросмотр", callback_data="to_preview"),
-        InlineKeyboardButton(text="↩️ Назад", callback_data="back_to_chars")
+        InlineKeyboardButton(text="➡️ Предпросмотр", callback_data=pack(Action.TO_PREVIEW)),
+        InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_CHARS))
     )
     
     return builder.as_markup()
 
+@lru_cache(maxsize=None)
 def preview_kb() -> InlineKeyboardMarkup:
     """Предпросмотр параметров"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Сгенерировать", callback_data="generate"),
-        InlineKeyboardButton(text="💾 Сохранить шаблон", callback_data="save_template")
+        InlineKeyboardButton(text="✅ Сгенерировать", callback_data=pack(Action.GENERATE)),
+        InlineKeyboardButton(text="💾 Сохранить шаблон", callback_data=pack(Action.SAVE_TEMPLATE))
     )
     builder.row(
-        InlineKeyboardButton(text="✏️ Изменить", callback_data="back_to_options"),
-        InlineKeyboardButton(text="🏠 В меню", callback_data="back_to_main")
+        InlineKeyboardButton(text="✏️ Изменить", callback_data=pack(Action.BACK_TO_OPTIONS)),
+        InlineKeyboardButton(text="🏠 В меню", callback_data=pack(Action.BACK_TO_MAIN))
     )
     return builder.as_markup()
 
-def templates_kb(templates: List[Dict]) -> InlineKeyboardMarkup:
-    """Список шаблонов"""
+@lru_cache(maxsize=None)
+def word_count_kb() -> InlineKeyboardMarkup:
+    """Выбор количества слов парольной фразы"""
+    builder = InlineKeyboardBuilder()
+    buttons = [
+        InlineKeyboardButton(text=str(count), callback_data=pack(Action.WORD_COUNT, count))
+        for count in config.DEFAULT_WORD_COUNTS
+    ]
+    for i in range(0, len(buttons), 3):
+        builder.row(*buttons[i:i+3])
+    builder.row(InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_MAIN)))
+    return builder.as_markup()
+
+def phrase_options_kb(separator: str = config.DEFAULT_SEPARATOR,
+                      current_options: Dict[str, bool] = None) -> InlineKeyboardMarkup:
+    """Разделитель и оформление парольной фразы"""
+    return _phrase_options_kb(separator, _flags_mask(current_options or {}, PHRASE_OPTIONS))
+
+@lru_cache(maxsize=None)
+def _phrase_options_kb(separator: str, mask: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
-    for template in templates:
+    builder.row(*(
+        InlineKeyboardButton(
+            text=f"✅ {label}" if key == separator else label,
+            callback_data=pack(Action.SEPARATOR, key)
+        )
+        for key, label in SEPARATOR_LABELS.items()
+    ))
+    for i, (key, text) in enumerate(PHRASE_OPTIONS):
+        status = "✅" if mask & (1 << i) else "❌"
         builder.row(InlineKeyboardButton(
-            text=f"📝 {template['name']} ({template['length']} симв.)",
-            callback_data=f"template_{template['id']}"
+            text=f"{status} {text}",
+            callback_data=pack(Action.TOGGLE_PHRASE_OPTION, key)
+        ))
+    
+    builder.row(
+        InlineKeyboardButton(text="➡️ Предпросмотр", callback_data=pack(Action.TO_PHRASE_PREVIEW)),
+        InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_WORDS))
+    )
+    
+    return builder.as_markup()
+
+@lru_cache(maxsize=None)
+def phrase_preview_kb() -> InlineKeyboardMarkup:
+    """Предпросмотр парольной фразы"""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Сгенерировать", callback_data=pack(Action.GENERATE)),
+        InlineKeyboardButton(text="💾 Сохранить шаблон", callback_data=pack(Action.SAVE_TEMPLATE))
+    )
+    builder.row(
+        InlineKeyboardButton(text="✏️ Изменить", callback_data=pack(Action.BACK_TO_PHRASE_OPTIONS)),
+        InlineKeyboardButton(text="🏠 В меню", callback_data=pack(Action.BACK_TO_MAIN))
+    )
+    return builder.as_markup()
+
+def templates_kb(templates: List[Dict], has_prev: bool = False, has_next: bool = False) -> InlineKeyboardMarkup:
+    """Список шаблонов (одна страница)"""
+    # Версия списка — то, что видно на кнопках; любое сохранение/удаление её меняет
+    version = tuple((t['id'], t['name'], template_size(t)) for t in templates)
+    prev_cursor = next_cursor = None
+    if templates and has_prev:
+        prev_cursor = str(PageCursor(True, templates[0]['created_at'], templates[0]['id']))
+    if templates and has_next:
+        next_cursor = str(PageCursor(False, templates[-1]['created_at'], templates[-1]['id']))
+    return _templates_kb(version, prev_cursor, next_cursor)
+
+def template_size(template: Dict[str, Any]) -> str:
+    """Размер для кнопки шаблона: символы пароля или слова фразы"""
+    if template.get('word_count'):
+        return f"{template['word_count']} сл."
+    return f"{template['length']} симв."
+
+@lru_cache(maxsize=1024)
+def _templates_kb(version: Tuple[Tuple[int, str, str], ...],
+                  prev_cursor: str = None, next_cursor: str = None) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    for template_id, name, size in version:
+        builder.row(InlineKeyboardButton(
+            text=f"📝 {name} ({size})",
+            callback_data=pack(Action.TEMPLATE, template_id)
         ))
     
+    navigation = []
+    if prev_cursor:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=pack(Action.TEMPLATES_PAGE, prev_cursor)))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=pack(Action.TEMPLATES_PAGE, next_cursor)))
+    if navigation:
+        builder.row(*navigation)
+    
     builder.row(
-        InlineKeyboardButton(text="➕ Новый шаблон", callback_data="new_template"),
-        InlineKeyboardButton(text="↩️ Назад", callback_data="back_to_main")
+        InlineKeyboardButton(text="➕ Новый шаблон", callback_data=pack(Action.NEW_TEMPLATE)),
+        InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_MAIN))
     )
     
     return builder.as_markup()
 
+@lru_cache(maxsize=1024)
 def template_actions_kb(template_id: int) -> InlineKeyboardMarkup:
     """Действия с шаблоном"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🔄 Использовать", callback_data=f"use_template_{template_id}"),
-        InlineKeyboardButton(text="✏️ Переименовать", callback_data=f"rename_template_{template_id}")
+        InlineKeyboardButton(text="🔄 Использовать", callback_data=pack(Action.USE_TEMPLATE, template_id)),
+        InlineKeyboardButton(text="✏️ Переименовать", callback_data=pack(Action.RENAME_TEMPLATE, template_id))
     )
     builder.row(
-        InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_template_{template_id}"),
-        InlineKeyboardButton(text="↩️ Назад", callback_data="back_to_templates")
+        InlineKeyboardButton(text="🗑️ Удалить", callback_data=pack(Action.DELETE_TEMPLATE, template_id)),
+        InlineKeyboardButton(text="↩️ Назад", callback_data=pack(Action.BACK_TO_TEMPLATES))
     )
     return builder.as_markup()
 
+@lru_cache(maxsize=None)
 def generated_kb() -> InlineKeyboardMarkup:
     """После генерации пароля"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🔄 Ещё один", callback_data="generate_another"),
-        InlineKeyboardButton(text="⚙️ Изменить параметры", callback_data="edit_params")
+        InlineKeyboardButton(text="🔄 Ещё один", callback_data=pack(Action.GENERATE_ANOTHER)),
+        InlineKeyboardButton(text="⚙️ Изменить параметры", callback_data=pack(Action.EDIT_PARAMS))
     )
     builder.row(
-        InlineKeyboardButton(text="💾 Сохранить шаблон", callback_data="save_current"),
-        InlineKeyboardButton(text="🏠 В меню", callback_data="back_to_main")
+        InlineKeyboardButton(text="💾 Сохранить шаблон", callback_data=pack(Action.SAVE_TEMPLATE)),
+        InlineKeyboardButton(text="🏠 В меню", callback_data=pack(Action.BACK_TO_MAIN))
     )
     return builder.as_markup()
 
+@lru_cache(maxsize=None)
 def back_to_main_kb() -> InlineKeyboardMarkup:
     """Кнопка назад в меню"""
     builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="🏠 В меню", callback_data="back_to_main"))
+    builder.row(InlineKeyboardButton(text="🏠 В меню", callback_data=pack(Action.BACK_TO_MAIN)))
     return builder.as_markup()
 
+@lru_cache(maxsize=None)
 def help_kb() -> InlineKeyboardMarkup:
     """Клавиатура для справки"""
     builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="🔄 Новый пароль", callback_data="new_password"))
-    builder.row(InlineKeyboardButton(text="🏠 В меню", callback_data="back_to_main"))
+    builder.row(InlineKeyboardButton(text="🔄 Новый пароль", callback_data=pack(Action.NEW_PASSWORD)))
+    builder.row(InlineKeyboardButton(text="🏠 В меню", callback_data=pack(Action.BACK_TO_MAIN)))
     return builder.as_markup()
+
+# Прогрев: все статические клавиатуры и все варианты переключателей
+for _kb in (main_menu_kb, length_kb, preview_kb, generated_kb, back_to_main_kb, help_kb,
+            word_count_kb, phrase_preview_kb):
+    _kb()
+for _mask in range(1 << len(CHAR_TYPES)):
+    _char_types_kb(_mask)
+for _mask in range(1 << len(OPTIONS)):
+    _options_kb(_mask)
+for _separator in SEPARATOR_LABELS:
+    for _mask in range(1 << len(PHRASE_OPTIONS)):
+        _phrase_options_kb(_separator, _mask)
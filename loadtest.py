@@ -0,0 +1,582 @@
+"""Нагрузочный прогон: синтетический трафик мастера через dp.feed_update.
+
+    python loadtest.py --users 2000 --concurrency 200
+    python loadtest.py --db-latency 5 --api-latency 50      # задержки сети, мс
+    python loadtest.py --dsn postgresql://localhost/passgen  # локальный Postgres вместо заглушки
+    FSM_STORAGE=memory python loadtest.py                    # параметры бота — из окружения, как в бою
+
+Каждый пользователь проходит мастер нажатием кнопок из последней полученной
+клавиатуры: /start → длина → типы символов → опции → предпросмотр → генерация →
+(ещё один) → сохранение шаблона → список шаблонов → использование шаблона.
+Bot API заменён сессией-заглушкой, БД — пулом в памяти с тем же числом
+соединений (DB_POOL_MAX_SIZE), поэтому ожидание пула видно так же, как в бою.
+Отчёт: пропускная способность, p50/p99 обработки апдейта, обращения к БД
+на апдейт, ожидание пула и задержка event loop.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("BOT_TOKEN", "123456:LOADTEST")
+# Симулируемые пользователи нажимают кнопки без пауз — лимит частоты отклонил бы большую часть сценария
+os.environ.setdefault("THROTTLE_ENABLED", "0")
+# cProfile искажает замеры, а медленные апдейты под нагрузкой оставляли бы файлы профилей
+os.environ.setdefault("PROFILE_INTERVAL", "0")
+
+import asyncpg  # noqa: E402
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import EditMessageText, SendMessage  # noqa: E402
+from aiogram.types import Chat, Message, Update  # noqa: E402
+
+import bot as bot_module  # noqa: E402
+from callbacks import Action, unpack  # noqa: E402
+from config import config  # noqa: E402
+from database import PARAM_COLUMNS, db  # noqa: E402
+
+# Идентификаторы симулируемых пользователей не пересекаются с настоящими
+USER_ID_BASE = 9_000_000_000
+
+
+# ========== БД в памяти ==========
+
+class MemoryDatabase:
+    """Таблицы бота в памяти; разбирает только запросы, которые выполняет database.py"""
+
+    def __init__(self):
+        self.users: Dict[int, Dict] = {}         # telegram_id -> строка
+        self.templates: Dict[int, Dict] = {}     # id -> строка
+        self.last_params: Dict[int, Dict] = {}   # user_id -> строка
+        self.fsm: Dict[str, tuple] = {}          # key -> (state, data)
+        self.columns: Dict[str, set] = {}        # таблица -> столбцы (DDL проверяется по порядку, как в Postgres)
+        self._user_ids = itertools.count(1)
+        self._template_ids = itertools.count(1)
+        self.queries: Dict[str, int] = defaultdict(int)
+
+    def user_by_id(self, user_id: int) -> Optional[Dict]:
+        return next((u for u in self.users.values() if u['id'] == user_id), None)
+
+    def user_templates(self, user_id: int) -> List[Dict]:
+        rows = [t for t in self.templates.values() if t['user_id'] == user_id]
+        return sorted(rows, key=lambda t: (t['created_at'], t['id']), reverse=True)
+
+    # --- обработчики запросов: (префикс нормализованного SQL, метод) ---
+
+    def upsert_user(self, telegram_id, username, first_name, last_name):
+        user = self.users.get(telegram_id)
+        now = datetime.utcnow()
+        if user is None:
+            user = self.users[telegram_id] = {
+                'id': next(self._user_ids), 'telegram_id': telegram_id, 'username': username,
+                'first_name': first_name, 'last_name': last_name, 'created_at': now, 'last_active': now,
+            }
+        else:
+            user.update(username=username, last_active=now)
+        return dict(user)
+
+    def touch_users(self, telegram_id, username, timestamp):
+        if telegram_id in self.users:
+            self.users[telegram_id].update(username=username, last_active=datetime.utcfromtimestamp(timestamp))
+
+    def insert_template(self, user_id, name, *values):
+        if any(t['user_id'] == user_id and t['name'] == name for t in self.templates.values()):
+            raise asyncpg.UniqueViolationError(
+                'duplicate key value violates unique constraint "templates_user_id_name_key"'
+            )
+        template = {'id': next(self._template_ids), 'user_id': user_id, 'name': name,
+                    **dict(zip(PARAM_COLUMNS, values)), 'created_at': datetime.utcnow()}
+        self.templates[template['id']] = template
+        return dict(template)
+
+    def template_by_owner(self, template_id, user_id):
+        t = self.templates.get(template_id)
+        return dict(t) if t and t['user_id'] == user_id else None
+
+    def template_by_telegram_user(self, template_id, telegram_id):
+        user = self.users.get(telegram_id)
+        return self.template_by_owner(template_id, user['id']) if user else None
+
+    def templates_of(self, user_id, limit=None):
+        return [dict(t) for t in self.user_templates(user_id)[:limit]]
+
+    def templates_page(self, user_id, *args):
+        rows = self.user_templates(user_id)
+        if len(args) == 1:
+            return [dict(t) for t in rows[:args[0]]]
+        created_at, template_id, limit = args
+        key = (created_at, template_id)
+        return [dict(t) for t in rows if (t['created_at'], t['id']) < key][:limit]
+
+    def templates_page_backward(self, user_id, created_at, template_id, limit):
+        rows = reversed(self.user_templates(user_id))
+        return [dict(t) for t in rows if (t['created_at'], t['id']) > (created_at, template_id)][:limit]
+
+    def delete_template(self, template_id, user_id):
+        t = self.templates.get(template_id)
+        if t and t['user_id'] == user_id:
+            del self.templates[template_id]
+            return "DELETE 1"
+        return "DELETE 0"
+
+    def delete_template_by_telegram_user(self, template_id, telegram_id):
+        user = self.users.get(telegram_id)
+        if user and self.delete_template(template_id, user['id']) == "DELETE 1":
+            return user['id']
+        return None
+
+    def delete_user(self, telegram_id):
+        user = self.users.pop(telegram_id, None)
+        if user is None:
+            return "DELETE 0"
+        self.last_params.pop(user['id'], None)
+        for t in [t for t in self.templates.values() if t['user_id'] == user['id']]:
+            del self.templates[t['id']]
+        return "DELETE 1"
+
+    def upsert_last_params(self, user_id, *values):
+        if self.user_by_id(user_id) is not None:
+            self.last_params[user_id] = {'user_id': user_id, **dict(zip(PARAM_COLUMNS, values)),
+                                         'updated_at': datetime.utcnow()}
+
+    def get_last_params(self, user_id):
+        row = self.last_params.get(user_id)
+        return dict(row) if row else None
+
+    def last_params_by_telegram_user(self, telegram_id):
+        user = self.users.get(telegram_id)
+        if user is None:
+            return None
+        row = self.last_params.get(user['id']) or {'user_id': None}
+        return {'uid': user['id'], **row}
+
+    def fsm_get(self, key):
+        record = self.fsm.get(key)
+        return {'state': record[0], 'data': record[1]} if record else None
+
+    def fsm_put(self, key, state, data):
+        self.fsm[key] = (state, data)
+
+    def fsm_delete(self, key):
+        self.fsm.pop(key, None)
+
+    def stats(self):
+        return {'u': len(self.users), 'd': 1}
+
+    # --- DDL: схема ведётся по именам столбцов, ссылка на несуществующий — ошибка ---
+
+    def _check_columns(self, table: str, columns):
+        missing = [c for c in columns if c not in self.columns.get(table, ())]
+        if missing:
+            raise asyncpg.UndefinedColumnError(f'column "{missing[0]}" does not exist')
+
+    def create_table(self, query: str):
+        table, body = re.match(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*)\)$", query).groups()
+        columns = {item.split()[0] for item in re.split(r",\s*(?![^()]*\))", body)
+                   if not item.upper().startswith(("UNIQUE", "PRIMARY KEY"))}
+        self.columns.setdefault(table, columns)
+        return "CREATE TABLE"
+
+    def alter_table(self, query: str):
+        table, body = re.match(r"ALTER TABLE (\w+) (.*)$", query).groups()
+        if table not in self.columns:
+            raise asyncpg.UndefinedTableError(f'relation "{table}" does not exist')
+        for action in body.split(", "):
+            added = re.match(r"ADD COLUMN IF NOT EXISTS (\w+)", action)
+            if added:
+                self.columns[table].add(added[1])
+            else:
+                self._check_columns(table, [re.match(r"ALTER COLUMN (\w+)", action)[1]])
+        return "ALTER TABLE"
+
+    def create_index(self, query: str):
+        table, body = re.match(r"CREATE INDEX IF NOT EXISTS \w+ ON (\w+) (.*)$", query).groups()
+        self._check_columns(table, re.findall(r"\w+", re.sub(r"\b(INCLUDE|DESC|ASC)\b", "", body)))
+        return "CREATE INDEX"
+
+    def drop_index(self, query: str):
+        return "DROP INDEX"
+
+    DDL = [
+        ("CREATE TABLE ", create_table),
+        ("ALTER TABLE ", alter_table),
+        ("CREATE INDEX ", create_index),
+        ("DROP INDEX ", drop_index),
+    ]
+
+    HANDLERS = [
+        ("INSERT INTO users ", upsert_user),
+        ("UPDATE users SET last_active", touch_users),
+        ("INSERT INTO templates ", insert_template),
+        ("SELECT * FROM templates WHERE id = $1 AND user_id = $2", template_by_owner),
+        ("SELECT t.* FROM templates t JOIN users u", template_by_telegram_user),
+        ("SELECT * FROM templates WHERE user_id = $1", templates_of),
+        ("SELECT id, name, length, word_count, created_at FROM templates WHERE user_id = $1 AND (created_at, id) >",
+         templates_page_backward),
+        ("SELECT id, name, length, word_count, created_at FROM templates WHERE user_id = $1", templates_page),
+        ("DELETE FROM templates WHERE id = $1 AND user_id = $2", delete_template),
+        ("DELETE FROM templates t USING users u", delete_template_by_telegram_user),
+        ("DELETE FROM users WHERE telegram_id", delete_user),
+        ("INSERT INTO last_params", upsert_last_params),
+        ("SELECT * FROM last_params WHERE user_id", get_last_params),
+        ("SELECT u.id AS uid, lp.* FROM users u", last_params_by_telegram_user),
+        ("SELECT state, data FROM fsm_storage", fsm_get),
+        ("INSERT INTO fsm_storage", fsm_put),
+        ("DELETE FROM fsm_storage", fsm_delete),
+        ("SELECT COUNT(*)", stats),
+    ]
+
+    def run(self, query: str, args: tuple):
+        normalized = " ".join(query.split())
+        for prefix, handler in self.DDL:
+            if normalized.startswith(prefix):
+                return handler(self, normalized)
+        for prefix, handler in self.HANDLERS:
+            if normalized.startswith(prefix):
+                self.queries[handler.__name__] += 1
+                return handler(self, *args)
+        raise NotImplementedError(f"MemoryDatabase не знает запрос: {normalized[:80]}")
+
+
+class MemoryConnection:
+    """Соединение asyncpg поверх MemoryDatabase; каждый вызов — один round trip"""
+
+    def __init__(self, pool: "MemoryPool"):
+        self.pool = pool
+
+    async def _roundtrip(self, query: str, args: tuple):
+        self.pool.round_trips += 1
+        if self.pool.latency:
+            await asyncio.sleep(self.pool.latency)
+        return self.pool.db.run(query, args)
+
+    async def fetchrow(self, query: str, *args):
+        return await self._roundtrip(query, args)
+
+    async def fetchval(self, query: str, *args):
+        return await self._roundtrip(query, args)
+
+    async def fetch(self, query: str, *args):
+        return await self._roundtrip(query, args)
+
+    async def execute(self, query: str, *args):
+        return await self._roundtrip(query, args)
+
+    async def executemany(self, query: str, args: List[tuple]):
+        # asyncpg отправляет пачку конвейером — один round trip
+        self.pool.round_trips += 1
+        if self.pool.latency:
+            await asyncio.sleep(self.pool.latency)
+        for row in args:
+            self.pool.db.run(query, row)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+class MemoryPool:
+    """Заглушка asyncpg.Pool с ограниченным числом соединений"""
+
+    def __init__(self, size: int, latency: float):
+        self.db = MemoryDatabase()
+        self.size = size
+        self.latency = latency
+        self.round_trips = 0
+        self._free = asyncio.Semaphore(size)
+
+    async def acquire(self, timeout: Optional[float] = None) -> MemoryConnection:
+        await asyncio.wait_for(self._free.acquire(), timeout)
+        return MemoryConnection(self)
+
+    async def release(self, conn: MemoryConnection):
+        self._free.release()
+
+    def get_size(self) -> int:
+        return self.size
+
+    async def close(self):
+        pass
+
+
+# ========== Bot API ==========
+
+class FakeSession(BaseSession):
+    """Сессия без сети: запоминает последнюю клавиатуру в каждом чате"""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.markups: Dict[int, Any] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = getattr(method, 'chat_id', None)
+        markup = getattr(method, 'reply_markup', None)
+        if chat_id is not None and markup is not None:
+            self.markups[chat_id] = markup
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return Message(
+                message_id=getattr(method, 'message_id', None) or next(self._message_ids),
+                date=datetime.now(), chat=Chat(id=chat_id, type='private'), text=method.text,
+            )
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b''
+
+    async def close(self):
+        pass
+
+
+# ========== Трафик ==========
+
+class SimulatedUser:
+    """Один пользователь: нажимает кнопки из последней клавиатуры своего чата"""
+
+    def __init__(self, harness: "Harness", index: int):
+        self.h = harness
+        self.id = USER_ID_BASE + index
+        self.rng = random.Random(index)
+        self.message_id = 1
+
+    def _user(self) -> Dict:
+        return {'id': self.id, 'is_bot': False, 'first_name': 'Load', 'username': f'load{self.id}'}
+
+    async def send(self, text: str):
+        await self.h.feed({'message': {
+            'message_id': self.message_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': self.id, 'type': 'private'}, 'from': self._user(),
+        }})
+
+    def buttons(self, action) -> List[str]:
+        markup = self.h.session.markups.get(self.id)
+        if markup is None:
+            return []
+        return [button.callback_data for row in markup.inline_keyboard for button in row
+                if (command := unpack(button.callback_data)) and command.action is action]
+
+    async def press(self, action, required: bool = True) -> bool:
+        options = self.buttons(action)
+        if not options:
+            if required:
+                self.h.flow_errors[action.name] += 1
+            return False
+        await self.h.feed({'callback_query': {
+            'id': str(self.h.next_update_id()), 'from': self._user(), 'chat_instance': str(self.id),
+            'data': self.rng.choice(options),
+            'message': {'message_id': self.message_id, 'date': int(time.time()), 'text': '…',
+                        'chat': {'id': self.id, 'type': 'private'}},
+        }})
+        return True
+
+    async def session(self, n: int):
+        await self.send("/start")
+        if not await self.press(Action.NEW_PASSWORD):
+            return
+
+        if self.rng.random() < 0.2:
+            await self.press(Action.CUSTOM_LENGTH)
+            await self.send(str(self.rng.randint(config.MIN_LENGTH, config.MAX_LENGTH)))
+        elif not await self.press(Action.LENGTH):
+            return
+
+        for _ in range(self.rng.randint(1, 4)):
+            await self.press(Action.TOGGLE_CHAR_TYPE)
+        await self.press(Action.TO_OPTIONS)
+        if not self.buttons(Action.TOGGLE_OPTION):
+            # Все типы символов оказались выключены — бот показал предупреждение
+            await self.press(Action.TOGGLE_CHAR_TYPE)
+            await self.press(Action.TO_OPTIONS)
+        for _ in range(self.rng.randint(0, 2)):
+            await self.press(Action.TOGGLE_OPTION)
+        await self.press(Action.TO_PREVIEW)
+        if not await self.press(Action.GENERATE):
+            return
+        if not self.buttons(Action.GENERATE_ANOTHER) and self.buttons(Action.GENERATE):
+            # Параметры не прошли проверку (например, без повторов длиннее алфавита):
+            # бот ответил предупреждением и оставил предпросмотр — это не сбой
+            self.h.rejected += 1
+            return
+        while self.rng.random() < 0.3:
+            await self.press(Action.GENERATE_ANOTHER)
+
+        if self.rng.random() < 0.5:
+            await self.press(Action.SAVE_TEMPLATE)
+            await self.send(f"Шаблон {n}")
+            await self.press(Action.MY_TEMPLATES)
+            if await self.press(Action.TEMPLATE, required=False):
+                await self.press(Action.USE_TEMPLATE)
+        else:
+            await self.press(Action.BACK_TO_MAIN)
+            await self.press(Action.MY_TEMPLATES)
+
+
+class Harness:
+    def __init__(self, bot, session, dp):
+        self.bot = bot
+        self.session = session
+        self.dp = dp
+        self._update_ids = itertools.count(1)
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.flow_errors: Dict[str, int] = defaultdict(int)
+        self.rejected = 0  # генераций, отклонённых проверкой параметров
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    async def feed(self, payload: Dict):
+        update = Update.model_validate({'update_id': self.next_update_id(), **payload}, context={'bot': self.bot})
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - started)
+
+
+async def loop_lag_monitor(samples: List[float], interval: float = 0.01):
+    """Насколько позже запланированного просыпается задача — мера загрузки event loop"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def run(args) -> Dict[str, Any]:
+    pool = None
+    if args.dsn:
+        config.DATABASE_URL = args.dsn
+    else:
+        pool = MemoryPool(config.DB_POOL_MAX_SIZE, args.db_latency / 1000)
+    await db.connect(pool)
+
+    session = FakeSession(args.api_latency / 1000)
+    bot = Bot("123456:LOADTEST", session=session)
+    harness = Harness(bot, session, bot_module.dp)
+    users = [SimulatedUser(harness, i) for i in range(args.users)]
+
+    lag: List[float] = []
+    monitor = asyncio.create_task(loop_lag_monitor(lag))
+    limiter = asyncio.Semaphore(args.concurrency)
+
+    async def run_user(user: SimulatedUser):
+        async with limiter:
+            for n in range(args.sessions):
+                await user.session(n)
+
+    rt_before = pool.round_trips if pool else 0
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(user) for user in users))
+    elapsed = time.perf_counter() - started
+    rt_handlers = (pool.round_trips if pool else 0) - rt_before
+
+    # Отложенные записи и правки тоже считаются: сбрасываем всё, что осталось в буферах
+    await bot_module.edit_coalescer.close()
+    await bot_module.background.drain()
+    await bot_module.dp.storage.close()
+    await db.close()
+    monitor.cancel()
+
+    updates = len(harness.latencies)
+    stats = db.pool_stats
+    return {
+        'users': args.users,
+        'updates': updates,
+        'seconds': round(elapsed, 3),
+        'updates_per_sec': round(updates / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(harness.latencies, 50) * 1000, 2),
+            'p99': round(percentile(harness.latencies, 99) * 1000, 2),
+            'max': round(max(harness.latencies, default=0) * 1000, 2),
+        },
+        'db': {
+            'round_trips': pool.round_trips if pool else None,
+            'round_trips_per_update': round(pool.round_trips / updates, 3) if pool and updates else None,
+            'round_trips_in_handlers': rt_handlers if pool else None,
+            'queries': dict(pool.db.queries) if pool else None,
+            'pool_size': config.DB_POOL_MAX_SIZE,
+            'pool_in_use_peak': stats.in_use_peak,
+            'pool_wait_avg_ms': round(stats.wait_avg * 1000, 3),
+            'pool_wait_max_ms': round(stats.wait_max * 1000, 3),
+            'pool_timeouts': stats.timeouts,
+        },
+        'scheduler': {
+            'workers': bot_module.scheduler.workers,
+            'wait_avg_ms': round(bot_module.scheduler.wait_avg * 1000, 3),
+            'wait_max_ms': round(bot_module.scheduler.wait_max * 1000, 3),
+        } if config.SCHEDULER_ENABLED else None,
+        'loop_lag_ms': {
+            'p50': round(percentile(lag, 50) * 1000, 2),
+            'p99': round(percentile(lag, 99) * 1000, 2),
+            'max': round(max(lag, default=0) * 1000, 2),
+        },
+        'api_calls': dict(session.calls),
+        'errors': harness.errors,
+        'flow_errors': dict(harness.flow_errors),
+        'rejected': harness.rejected,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон мастера через dp.feed_update")
+    parser.add_argument('--users', type=int, default=2000, help="число симулируемых пользователей")
+    parser.add_argument('--sessions', type=int, default=1, help="проходов мастера на пользователя")
+    parser.add_argument('--concurrency', type=int, default=200, help="одновременно активных пользователей")
+    parser.add_argument('--db-latency', type=float, default=2.0, help="задержка одного запроса к БД-заглушке, мс")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="задержка вызова Bot API, мс")
+    parser.add_argument('--dsn', help="локальный Postgres вместо заглушки (нужна пустая тестовая БД)")
+    parser.add_argument('--json', action='store_true', help="вывести отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    # Лог каждого апдейта и предупреждения о медленных заглушили бы отчёт
+    logging.getLogger().setLevel(logging.ERROR)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"Пользователей: {report['users']}, апдейтов: {report['updates']} за {report['seconds']} с")
+    print(f"Пропускная способность: {report['updates_per_sec']} апдейтов/с")
+    print("Обработка апдейта, мс: p50 {p50}, p99 {p99}, max {max}".format(**report['latency_ms']))
+    d = report['db']
+    if d['round_trips'] is not None:
+        print(f"БД: {d['round_trips']} обращений, {d['round_trips_per_update']} на апдейт "
+              f"(в обработчиках {d['round_trips_in_handlers']})")
+    print(f"Пул: {d['pool_size']} соединений, пик занятых {d['pool_in_use_peak']}, ожидание ср. "
+          f"{d['pool_wait_avg_ms']} мс / макс. {d['pool_wait_max_ms']} мс, таймаутов {d['pool_timeouts']}")
+    if report['scheduler']:
+        print("Очередь апдейтов: {workers} воркеров, ожидание ср. {wait_avg_ms} мс / макс. {wait_max_ms} мс"
+              .format(**report['scheduler']))
+    print("Задержка event loop, мс: p50 {p50}, p99 {p99}, max {max}".format(**report['loop_lag_ms']))
+    print(f"Вызовы Bot API: {report['api_calls']}")
+    print(f"Генераций отклонено проверкой параметров (ожидаемо): {report['rejected']}")
+    if report['errors'] or report['flow_errors']:
+        print(f"⚠️ Ошибки обработчиков: {report['errors']}, сбои сценария: {report['flow_errors']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Простые метрики в формате Prometheus. Горячий путь — только инкремент
+# в словаре (бот работает в одном event loop, блокировки не нужны),
+# кумулятивные бакеты и функции-датчики считаются в момент запроса /metrics.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY: List["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in list(self.values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {value}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики по бакетам (последний — +Inf), сумма]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        """Время выполнения блока; для случаев, когда декоратор timed мерит лишнее"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def samples(self) -> Iterable[str]:
+        for label_values, (counts, total) in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.label_names, label_values, f'le="{le}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, label_values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.label_names, label_values)} {cumulative}"
+
+
+class GaugeFunc(Metric):
+    """Датчик, значение которого вычисляется функцией при запросе /metrics"""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float], metric_type: str = "gauge"):
+        super().__init__(name, documentation)
+        self.func = func
+        self.type = metric_type
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {self.func()}"
+
+
+def timed(histogram: Histogram):
+    """Декоратор для async-функций: время выполнения с меткой — именем функции"""
+    def decorator(func):
+        name = func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# === Метрики бота ===
+
+UPDATES_TOTAL = Counter("bot_updates_total", "Processed updates by type", ["type"])
+UPDATE_SECONDS = Histogram("bot_update_duration_seconds", "End-to-end update processing time", ["type"])
+HANDLER_SECONDS = Histogram("bot_handler_duration_seconds", "Handler latency", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler exceptions", ["handler"])
+DB_QUERY_SECONDS = Histogram("bot_db_query_duration_seconds", "Postgres query latency by Database method", ["method"])
+DB_POOL_WAIT_SECONDS = Histogram("bot_db_pool_wait_seconds", "Time waiting for a pool connection")
+API_SECONDS = Histogram("bot_api_request_duration_seconds", "Outgoing Bot API call latency", ["method"])
+API_ERRORS = Counter("bot_api_errors_total", "Failed Bot API calls", ["method", "error"])
+PASSWORDS_GENERATED = Counter("bot_passwords_generated_total", "Generated passwords")
+THROTTLED_TOTAL = Counter("bot_throttled_total", "Updates rejected by the rate limiter", ["group"])
+SCHEDULER_WAIT_SECONDS = Histogram("bot_scheduler_wait_seconds", "Time an update waits in the per-user queue")
+KEYBOARD_EDITS = Counter("bot_keyboard_edits_total", "Debounced keyboard edits by outcome", ["result"])
+BACKGROUND_ERRORS = Counter("bot_background_errors_total", "Failed background tasks", ["task"])
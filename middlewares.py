@@ -0,0 +1,153 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import CallbackQuery, InlineQuery, TelegramObject, Update
+
+from callbacks import Action, unpack
+from edits import EditCoalescer
+from metrics import (
+    API_ERRORS, API_SECONDS, HANDLER_ERRORS, HANDLER_SECONDS, THROTTLED_TOTAL, UPDATE_SECONDS, UPDATES_TOTAL
+)
+from profiling import UpdateProfiler, finish_phases, phase, start_phases
+from throttling import Throttler
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+
+def handler_name(event: TelegramObject, data: Dict[str, Any]) -> str:
+    """Имя обработчика для метрик: код действия для кнопок, имя функции для сообщений"""
+    if isinstance(event, CallbackQuery):
+        command = unpack(event.data)
+        return command.action.name.lower() if command else "unknown"
+    handler = data.get("handler")
+    return handler.callback.__name__ if handler is not None else "unknown"
+
+
+def update_name(update: Update) -> str:
+    """Короткое имя апдейта: действие кнопки, команда или тип"""
+    event = update.event
+    if isinstance(event, CallbackQuery):
+        command = unpack(event.data)
+        return command.action.name.lower() if command else "unknown"
+    text = getattr(event, "text", None)
+    if text and text.startswith("/"):
+        return text.split(maxsplit=1)[0].split("@", 1)[0][1:] or update.event_type
+    return update.event_type
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware диспетчера: число апдейтов и полное время обработки"""
+
+    async def __call__(self, handler: Handler, event: Update, data: Dict[str, Any]) -> Any:
+        update_type = event.event_type
+        UPDATES_TOTAL.inc(update_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_SECONDS.observe(time.perf_counter() - started, update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware роутера: время и ошибки каждого обработчика"""
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        name = handler_name(event, data)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки исходящих вызовов Bot API"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            with phase("api"):
+                return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - started, name)
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Внешний middleware диспетчера: время апдейта по фазам (fsm, db, api, other)
+    и cProfile после медленных апдейтов; медленные попадают в /slow"""
+
+    def __init__(self, profiler: UpdateProfiler):
+        self.profiler = profiler
+
+    async def __call__(self, handler: Handler, event: Update, data: Dict[str, Any]) -> Any:
+        token = start_phases()
+        name = update_name(event)
+        profile = self.profiler.start_profile(name)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            total = time.perf_counter() - started
+            self.profiler.stop_profile(profile)
+            phases = finish_phases(token)
+            self.profiler.record(name, event.update_id, total, phases, profile)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Внешний middleware сообщений, кнопок и inline-запросов: лимит частоты на пользователя.
+
+    Лишнее нажатие отклоняется до фильтров и обработчика — только callback.answer,
+    без запросов к БД; лишние сообщения и inline-запросы молча отбрасываются."""
+
+    def __init__(self, throttler: Throttler):
+        self.throttler = throttler
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            command = unpack(event.data)
+            group = self.throttler.group_of(command.action if command else None)
+        elif isinstance(event, InlineQuery):
+            group = "inline"
+        else:
+            group = "message"
+        if self.throttler.hit(group, user.id):
+            return await handler(event, data)
+
+        THROTTLED_TOTAL.inc(group)
+        if isinstance(event, CallbackQuery):
+            await event.answer("⏳ Слишком часто, подождите секунду")
+
+
+class PendingEditsMiddleware(BaseMiddleware):
+    """Внутренний middleware кнопок: перед обработчиком, который может изменить
+    сообщение, отправляет отложенную клавиатуру этого сообщения"""
+
+    def __init__(self, coalescer: EditCoalescer, debounced: Iterable[Action]):
+        self.coalescer = coalescer
+        self.debounced = frozenset(debounced)
+
+    async def __call__(self, handler: Handler, event: CallbackQuery, data: Dict[str, Any]) -> Any:
+        command = unpack(event.data)
+        if event.message is not None and (command is None or command.action not in self.debounced):
+            await self.coalescer.flush(event.message.chat.id, event.message.message_id)
+        return await handler(event, data)
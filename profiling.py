@@ -0,0 +1,163 @@
+import cProfile
+import heapq
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from itertools import count
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from config import config
+
+# Фазы текущего апдейта: имя -> секунды. Контекст свой у каждой задачи asyncio,
+# поэтому параллельные апдейты не смешиваются.
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("profile_phases", default=None)
+_in_phase: ContextVar[bool] = ContextVar("profile_in_phase", default=False)
+
+
+def start_phases() -> Token:
+    return _phases.set({})
+
+
+def finish_phases(token: Token) -> Dict[str, float]:
+    phases = _phases.get() or {}
+    _phases.reset(token)
+    return phases
+
+
+@contextmanager
+def phase(name: str):
+    """Учесть время блока в фазе текущего апдейта (вложенные фазы не считаются повторно)"""
+    phases = _phases.get()
+    if phases is None or _in_phase.get():
+        yield
+        return
+    token = _in_phase.set(True)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - started
+        _in_phase.reset(token)
+
+
+class SlowUpdate(NamedTuple):
+    total: float
+    name: str
+    update_id: int
+    phases: Dict[str, float]
+    profile_path: Optional[str]
+    at: float
+
+
+class UpdateProfiler:
+    """Самые медленные апдейты и их профили cProfile"""
+
+    def __init__(self, threshold: float, interval: float, top_size: int,
+                 profile_dir: str, max_files: int):
+        self.threshold = threshold
+        self.interval = interval
+        self.top_size = top_size
+        self.profile_dir = profile_dir
+        self.max_files = max_files
+        # Min-куча (total, порядковый номер, SlowUpdate) — вытесняется самый быстрый
+        self._top: List[tuple] = []
+        self._seq = count()
+        self._profiling = False
+        # Типы апдейтов, которые недавно были медленными: следующий такой профилируется
+        self._armed: Set[str] = set()
+        self._next_profile_at = 0.0
+        self.updates = 0
+        self.slow_updates = 0
+        self.profiles_written = 0
+
+    def start_profile(self, name: str) -> Optional[cProfile.Profile]:
+        """Включить cProfile, если апдейт этого типа недавно был медленным.
+
+        Медленный ли апдейт, известно только в конце, поэтому профилируется следующий
+        апдейт того же типа, а сохраняется профиль, только если и он медленный.
+        cProfile трассирует весь процесс (и другие задачи event loop во время await),
+        поэтому одновременно профилируется один апдейт и не чаще раза в interval секунд.
+        """
+        if self._profiling or name not in self._armed:
+            return None
+        now = time.monotonic()
+        if now < self._next_profile_at:
+            return None
+        self._armed.discard(name)
+        self._next_profile_at = now + self.interval
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Уже работает другой профилировщик
+            return None
+        self._profiling = True
+        return profile
+
+    def stop_profile(self, profile: Optional[cProfile.Profile]):
+        if profile is not None:
+            profile.disable()
+            self._profiling = False
+
+    def record(self, name: str, update_id: int, total: float, phases: Dict[str, float],
+               profile: Optional[cProfile.Profile]):
+        self.updates += 1
+        if total < self.threshold:
+            return
+        self.slow_updates += 1
+        if self.interval > 0:
+            self._armed.add(name)
+
+        phases = dict(phases)
+        phases["other"] = max(total - sum(phases.values()), 0.0)
+        profile_path = self._dump(profile, name, update_id) if profile is not None else None
+        logging.warning(
+            f"🐢 Медленный апдейт {update_id} ({name}): {total * 1000:.0f} мс, "
+            + ", ".join(f"{k} {v * 1000:.0f} мс" for k, v in phases.items())
+        )
+
+        entry = (total, next(self._seq), SlowUpdate(total, name, update_id, phases, profile_path, time.time()))
+        if len(self._top) < self.top_size:
+            heapq.heappush(self._top, entry)
+        elif total > self._top[0][0]:
+            heapq.heapreplace(self._top, entry)
+
+    def _dump(self, profile: cProfile.Profile, name: str, update_id: int) -> Optional[str]:
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{int(time.time())}-{update_id}-{name}.pstats")
+            profile.dump_stats(path)
+            self.profiles_written += 1
+            self._prune()
+            return path
+        except OSError as e:
+            logging.error(f"❌ Не удалось сохранить профиль: {e}")
+            return None
+
+    def _prune(self):
+        """Оставить на диске только max_files последних профилей"""
+        files = sorted(
+            (os.path.join(self.profile_dir, f) for f in os.listdir(self.profile_dir) if f.endswith(".pstats")),
+            key=os.path.getmtime
+        )
+        for path in files[:-self.max_files]:
+            os.remove(path)
+
+    def top(self) -> List[SlowUpdate]:
+        """Медленные апдейты, от самого долгого"""
+        return [entry[2] for entry in sorted(self._top, reverse=True)]
+
+    def reset(self):
+        self._top.clear()
+        self.updates = self.slow_updates = 0
+
+
+profiler = UpdateProfiler(
+    threshold=config.SLOW_UPDATE_THRESHOLD,
+    interval=config.PROFILE_INTERVAL,
+    top_size=config.PROFILE_TOP_SIZE,
+    profile_dir=config.PROFILE_DIR,
+    max_files=config.PROFILE_MAX_FILES,
+)
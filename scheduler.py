@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+from metrics import SCHEDULER_WAIT_SECONDS
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class UpdateScheduler:
+    """Очереди FIFO по пользователям поверх ограниченного пула воркеров.
+
+    Апдейты одного пользователя выполняются строго по очереди (без гонок на
+    FSM-данных), разных пользователей — параллельно, но не больше workers сразу.
+    Пользователь с непустой очередью после каждого апдейта встаёт в конец общей
+    очереди готовых, поэтому один активный пользователь не занимает все воркеры.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # ключ пользователя -> очередь (job, future, время постановки)
+        self._queues: Dict[Hashable, Deque[tuple]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Выставлен, когда нет ни ожидающих, ни выполняемых апдейтов
+        self._idle: Optional[asyncio.Event] = None
+        self._closing = False
+        self.pending = 0
+        self.busy = 0
+        self.processed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def users(self) -> int:
+        return len(self._queues)
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.processed if self.processed else 0.0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Первый запуск (или новый event loop): очереди прошлого цикла недействительны
+        self._loop = loop
+        self._queues.clear()
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.pending = self.busy = 0
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, key: Hashable, job: Job) -> Any:
+        """Поставить job в очередь пользователя key и дождаться результата"""
+        if self._closing:
+            # Вебхук и polling к этому моменту уже остановлены; сюда попадают только опоздавшие
+            raise RuntimeError("Планировщик останавливается, апдейт не принят")
+        self._ensure_workers()
+        future = self._loop.create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            self._queues[key] = deque([(job, future, time.perf_counter())])
+            self._ready.put_nowait(key)
+        else:
+            queue.append((job, future, time.perf_counter()))
+        self.pending += 1
+        self._idle.clear()
+        return await future
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._queues[key]
+            job, future, enqueued_at = queue.popleft()
+            self.pending -= 1
+
+            wait = time.perf_counter() - enqueued_at
+            SCHEDULER_WAIT_SECONDS.observe(wait)
+            self.processed += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+            self.busy += 1
+            try:
+                # Если ожидающий уже отменён (остановка бота), апдейт не выполняется
+                if not future.done():
+                    result = await job()
+                    if not future.done():
+                        future.set_result(result)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.busy -= 1
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._queues[key]
+                if not self.pending and not self.busy:
+                    self._idle.set()
+
+    async def close(self, timeout: float = 0):
+        """Перестать принимать апдейты, дождаться очередей (не дольше timeout) и остановить воркеры.
+
+        Апдейты, не выполненные за timeout, отменяются.
+        """
+        self._closing = True
+        if self._tasks and timeout > 0:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(
+                    f"⚠️ Очередь апдейтов не разобрана за {timeout:g} с: "
+                    f"отменяются {self.pending} в ожидании и {self.busy} выполняемых"
+                )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for queue in self._queues.values():
+            for _, future, _ in queue:
+                future.cancel()
+        self._queues.clear()
+        self._tasks = []
+        self._loop = None
+
+
+def update_key(update: Update) -> Hashable:
+    """Ключ очереди: пользователь, иначе чат; апдейты без них не упорядочиваются"""
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.user_id is not None:
+        return context.user_id
+    if context.chat_id is not None:
+        return ("chat", context.chat_id)
+    return ("update", update.update_id)
+
+
+class ScheduledDispatcher(Dispatcher):
+    """Dispatcher, пропускающий каждый апдейт через UpdateScheduler.
+
+    feed_update вызывают и polling (задача на апдейт), и обработчик вебхука;
+    постановка в очередь происходит до первого await, поэтому порядок очереди
+    совпадает с порядком получения апдейтов.
+    """
+
+    def __init__(self, scheduler: UpdateScheduler, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        return await self.scheduler.submit(
+            update_key(update), partial(super().feed_update, bot, update, **kwargs)
+        )
@@ -8,6 +8,10 @@ class PasswordStates(StatesGroup):
     SET_OPTIONS = State()
     PREVIEW = State()
     
+    # Парольная фраза
+    SET_WORD_COUNT = State()
+    SET_PHRASE_OPTIONS = State()
+    
     # Дополнительные состояния
     SAVE_TEMPLATE_NAME = State()
     IMPORT_TEMPLATE = State()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from cache import TTLCache
+from config import config
+from database import Database
+from profiling import phase
+
+
+class PostgresStorage(BaseStorage):
+    """FSM-хранилище в Postgres с локальным LRU и отложенной записью.
+
+    Кэш и буфер записи локальны для процесса и с базой не сверяются, поэтому
+    этот режим — для одного инстанса. С shared=True (FSM_SHARED) кэша и буфера нет:
+    каждое чтение и запись идут в Postgres, и несколько инстансов видят одно состояние.
+    """
+
+    def __init__(self, database: Database, key_builder: Optional[KeyBuilder] = None,
+                 shared: bool = config.FSM_SHARED):
+        self.db = database
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self.shared = shared
+        # ключ -> [state, data]
+        self.cache = TTLCache(config.FSM_CACHE_SIZE, config.FSM_CACHE_TTL)
+        # Изменённые записи: ключ -> (state, data в JSON); хранится только последняя версия
+        self._dirty: Dict[str, tuple] = {}
+        self._inflight: Dict[str, tuple] = {}
+        self._flush_event = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.db_reads = 0
+        self.db_writes = 0
+
+    async def _record(self, key: StorageKey) -> list:
+        k = self.key_builder.build(key)
+        if self.shared:
+            return await self._read(k)
+        record = self.cache.get(k)
+        if record is not None:
+            return record
+
+        pending = self._dirty.get(k) or self._inflight.get(k)
+        if pending is not None:
+            record = [pending[0], json.loads(pending[1])]
+        else:
+            record = await self._read(k)
+        self.cache.set(k, record)
+        return record
+
+    async def _read(self, k: str) -> list:
+        self.db_reads += 1
+        with phase("fsm"):
+            async with self.db.acquire() as conn:
+                row = await conn.fetchrow("SELECT state, data FROM fsm_storage WHERE key = $1", k)
+        return [row['state'], json.loads(row['data'])] if row else [None, {}]
+
+    async def _save(self, key: StorageKey, record: list):
+        if not self.shared:
+            self._mark_dirty(key, record)
+            return
+        k = self.key_builder.build(key)
+        with phase("fsm"):
+            await self._write({k: (record[0], json.dumps(record[1], ensure_ascii=False))})
+
+    def _mark_dirty(self, key: StorageKey, record: list):
+        k = self.key_builder.build(key)
+        self.cache.set(k, record)
+        self._dirty[k] = (record[0], json.dumps(record[1], ensure_ascii=False))
+        # После close() фоновый цикл не перезапускается: остаток сбрасывает on_shutdown
+        if self._flush_task is None and not self._closing:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._dirty) >= config.FLUSH_BATCH_SIZE:
+            self._flush_event.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        state = state.state if isinstance(state, State) else state
+        if record[0] == state:
+            return
+        record[0] = state
+        await self._save(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        record = await self._record(key)
+        record[1] = data.copy()
+        await self._save(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key))[1].copy()
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=config.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Записать накопленные изменения"""
+        if not self._dirty or not self.db.pool:
+            return
+        self._inflight, self._dirty = self._dirty, {}
+        try:
+            await self._write(self._inflight)
+        except (Exception, asyncio.CancelledError) as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logging.error(f"❌ Ошибка записи FSM-состояний: {e}")
+            for k, value in self._inflight.items():
+                self._dirty.setdefault(k, value)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self._inflight = {}
+
+    async def _write(self, records: Dict[str, tuple]):
+        """Записать записи одной транзакцией: пустые удаляются, остальные upsert-ятся"""
+        upserts = [(k, state, data) for k, (state, data) in records.items() if state is not None or data != "{}"]
+        deletes = [(k,) for k, (state, data) in records.items() if state is None and data == "{}"]
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                if upserts:
+                    await conn.executemany(
+                        """
+                        INSERT INTO fsm_storage (key, state, data)
+                        VALUES ($1, $2, $3::jsonb)
+                        ON CONFLICT (key) DO UPDATE SET
+                            state = EXCLUDED.state,
+                            data = EXCLUDED.data,
+                            updated_at = NOW()
+                        """,
+                        upserts
+                    )
+                if deletes:
+                    await conn.executemany("DELETE FROM fsm_storage WHERE key = $1", deletes)
+        self.db_writes += len(records)
+
+    async def close(self) -> None:
+        # aiogram закрывает хранилище раньше on_shutdown, пока апдейты ещё дорабатывают:
+        # цикл дожидается текущей записи и останавливается, новые изменения копятся в _dirty
+        self._closing = True
+        self._flush_event.set()
+        if self._flush_task:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,81 @@
+import time
+from typing import Dict, Optional
+
+from callbacks import Action
+from config import config
+from metrics import GaugeFunc
+
+# Группы лимитов для callback-действий; остальные кнопки — "callback", сообщения — "message"
+THROTTLE_GROUPS: Dict[Action, str] = {
+    Action.GENERATE: "generate",
+    Action.GENERATE_ANOTHER: "generate",
+    Action.LAST_PARAMS: "generate",
+    Action.USE_TEMPLATE: "generate",
+    Action.TOGGLE_CHAR_TYPE: "toggle",
+    Action.TOGGLE_OPTION: "toggle",
+    Action.SEPARATOR: "toggle",
+    Action.TOGGLE_PHRASE_OPTION: "toggle",
+}
+
+
+class RateLimiter:
+    """Token bucket на пользователя в форме GCRA: на ключ хранится одно число —
+    момент, когда ведро снова станет полным. Ключи с прошедшим моментом
+    эквивалентны полному ведру и удаляются без потери информации."""
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1 / rate
+        # Сколько интервалов можно «занять» вперёд: burst запросов подряд проходят
+        self.tolerance = self.interval * (burst - 1)
+        self.full_at: Dict[int, float] = {}
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: int, now: float) -> bool:
+        full_at = max(self.full_at.get(key, now), now)
+        if full_at - now > self.tolerance:
+            self.rejected += 1
+            return False
+        self.full_at[key] = full_at + self.interval
+        self.allowed += 1
+        return True
+
+    def evict_idle(self, now: float) -> int:
+        idle = [key for key, full_at in self.full_at.items() if full_at <= now]
+        for key in idle:
+            del self.full_at[key]
+        return len(idle)
+
+
+class Throttler:
+    """Лимиты по группам действий с периодической очисткой простаивающих пользователей"""
+
+    def __init__(self, limits: Dict[str, tuple], sweep_interval: float):
+        self.limiters = {group: RateLimiter(rate, burst) for group, (rate, burst) in limits.items()}
+        self.sweep_interval = sweep_interval
+        self._swept_at = time.monotonic()
+        self.evicted = 0
+
+    @staticmethod
+    def group_of(action: Optional[Action]) -> str:
+        return THROTTLE_GROUPS.get(action, "callback")
+
+    def hit(self, group: str, user_id: int) -> bool:
+        now = time.monotonic()
+        if now - self._swept_at >= self.sweep_interval:
+            self._swept_at = now
+            self.evicted += sum(limiter.evict_idle(now) for limiter in self.limiters.values())
+        return self.limiters[group].hit(user_id, now)
+
+    @property
+    def tracked(self) -> int:
+        return sum(len(limiter.full_at) for limiter in self.limiters.values())
+
+    @property
+    def rejected(self) -> int:
+        return sum(limiter.rejected for limiter in self.limiters.values())
+
+
+throttler = Throttler(config.THROTTLE_LIMITS, config.THROTTLE_SWEEP_INTERVAL)
+
+GaugeFunc("bot_throttle_tracked_users", "Users with a non-full rate limit bucket", lambda: throttler.tracked)
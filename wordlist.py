@@ -0,0 +1,122 @@
+"""Словарь для парольных фраз в компактном файле.
+
+Формат: заголовок (магия, число слов), count + 1 смещений uint32 и все слова
+подряд в UTF-8. Слово i — blob[offsets[i]:offsets[i + 1]], поэтому доступ
+к любому слову — O(1) без разбора файла. Файл отображается в память (mmap)
+при первом обращении: при старте ничего не читается, в RSS попадают только
+страницы с прочитанными словами, а сама память общая для всех процессов.
+
+Сборка из списка слов (по слову в строке; формат EFF "11111<TAB>слово" тоже подходит):
+
+    python wordlist.py eff_large_wordlist.txt wordlist.bin
+"""
+import math
+import mmap
+import struct
+import sys
+from typing import Iterable, List, Optional
+
+from config import config
+
+MAGIC = b"PGWL"
+HEADER = struct.Struct("<4sI")     # магия, число слов
+OFFSET = struct.Struct("<I")
+SPAN = struct.Struct("<II")        # начало и конец слова в blob
+
+
+class Wordlist:
+    """Словарь в файле формата PGWL, открывается лениво"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map: Optional[mmap.mmap] = None
+        self._count = 0
+        self._blob_start = 0
+
+    def _open(self) -> mmap.mmap:
+        if self._map is None:
+            with open(self.path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(data) < HEADER.size:
+                data.close()
+                raise ValueError(f"{self.path}: файл словаря повреждён")
+            magic, count = HEADER.unpack_from(data, 0)
+            blob_start = HEADER.size + OFFSET.size * (count + 1)
+            if magic != MAGIC or len(data) < blob_start:
+                data.close()
+                raise ValueError(f"{self.path}: не файл словаря")
+            self._map, self._count, self._blob_start = data, count, blob_start
+        return self._map
+
+    @property
+    def available(self) -> bool:
+        try:
+            return len(self) > 0
+        except (OSError, ValueError):
+            return False
+
+    def __len__(self) -> int:
+        self._open()
+        return self._count
+
+    def __getitem__(self, index: int) -> str:
+        data = self._open()
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, end = SPAN.unpack_from(data, HEADER.size + OFFSET.size * index)
+        return data[self._blob_start + start:self._blob_start + end].decode('utf-8')
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def parse_words(lines: Iterable[str]) -> List[str]:
+    """Слова из текстового списка: последнее поле строки, без повторов, в исходном порядке"""
+    words, seen = [], set()
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        word = fields[-1]
+        # Фраза показывается внутри `...` в Markdown
+        if '`' in word or not word.isprintable():
+            raise ValueError(f"Недопустимое слово: {word!r}")
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def build(words: List[str], path: str):
+    encoded = [word.encode('utf-8') for word in words]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(b''.join(encoded))
+
+
+def main(argv: List[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not 1 <= len(argv) <= 2:
+        print(__doc__)
+        return 2
+    source, target = argv[0], argv[1] if len(argv) > 1 else config.WORDLIST_PATH
+    with open(source, encoding='utf-8') as f:
+        words = parse_words(f)
+    if len(words) < 2:
+        print("❌ В списке меньше двух слов")
+        return 1
+    build(words, target)
+    print(f"✅ {target}: {len(words)} слов, {math.log2(len(words)):.2f} бит на слово")
+    return 0
+
+
+wordlist = Wordlist(config.WORDLIST_PATH)
+
+if __name__ == '__main__':
+    sys.exit(main())